@@ -1,10 +1,25 @@
-from git import Repo
-from langchain_community.document_loaders import GitLoader
 import os
+import re
+import fcntl
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Bare clones of previously indexed repositories, refreshed with a fetch instead of a full clone
+REPO_CACHE_DIR = os.getenv("REPO_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "github_mirrors")
+REPO_CACHE_MAX_BYTES = int(os.getenv("REPO_CACHE_MAX_BYTES", str(5 * 1024 * 1024 * 1024)))
+# Parent directory of the per-job checkouts
+REPO_WORKSPACE_DIR = os.getenv("REPO_WORKSPACE_DIR") or tempfile.gettempdir()
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
 
 def file_filter(file_path):
     ignore_filepaths = ["package-lock.json"]
@@ -15,28 +30,148 @@ def file_filter(file_path):
     return True
 
 
+def clean_github_url(url):
+    """Reduce a GitHub URL to the base repository URL"""
+    # Remove /tree/main, /tree/master, /blob/main, etc.
+    clean_url = re.sub(r'/(tree|blob)/(main|master|develop|dev).*$', '', url)
+    # Remove trailing slash
+    return clean_url.rstrip('/')
+
+
+@contextmanager
+def _mirror_lock(mirror_path, blocking=True):
+    """Exclusive per-repository lock across threads and worker processes; yields False if not acquired"""
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(mirror_path, threading.Lock())
+    if not thread_lock.acquire(blocking):
+        yield False
+        return
+    try:
+        with open(mirror_path + ".lock", "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        thread_lock.release()
+
+
+def _directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _evict_mirrors(keep):
+    """Delete least recently used mirrors until the cache fits in REPO_CACHE_MAX_BYTES"""
+    mirrors = [
+        os.path.join(REPO_CACHE_DIR, name)
+        for name in os.listdir(REPO_CACHE_DIR)
+        if name.endswith(".git")
+    ]
+    sizes = {path: _directory_size(path) for path in mirrors}
+    total = sum(sizes.values())
+    for path in sorted(mirrors, key=os.path.getmtime):
+        if total <= REPO_CACHE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        # Skip mirrors another job is using right now
+        with _mirror_lock(path, blocking=False) as acquired:
+            if not acquired:
+                continue
+            print(f"Evicting cached mirror {path}")
+            shutil.rmtree(path, ignore_errors=True)
+            total -= sizes[path]
+
+
+# Branches and tags only; a --mirror clone of a GitHub repository also pulls every refs/pull/* head
+MIRROR_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+
+def update_mirror(clean_url):
+    """Create or refresh the bare clone of a repository and return its path"""
+    os.makedirs(REPO_CACHE_DIR, exist_ok=True)
+    name = hashlib.sha1(clean_url.encode("utf-8")).hexdigest()[:16]
+    mirror_path = os.path.join(REPO_CACHE_DIR, f"{name}.git")
+    with _mirror_lock(mirror_path):
+        if os.path.exists(mirror_path):
+            print(f"Fetching cached mirror of {clean_url}")
+            subprocess.run(
+                ['git', '--git-dir', mirror_path, 'fetch', '--prune', '--quiet', 'origin', *MIRROR_REFSPECS],
+                timeout=600, capture_output=True, text=True, check=True,
+            )
+        else:
+            print(f"Creating mirror of {clean_url}")
+            tmp_mirror = mirror_path + ".tmp"
+            shutil.rmtree(tmp_mirror, ignore_errors=True)
+            subprocess.run(
+                ['git', 'clone', '--bare', '--quiet', clean_url, tmp_mirror],
+                timeout=600, capture_output=True, text=True, check=True,
+            )
+            os.replace(tmp_mirror, mirror_path)
+        # The modification time doubles as the LRU timestamp
+        os.utime(mirror_path)
+    _evict_mirrors(keep=mirror_path)
+    return mirror_path
+
+
+class SourceDocument:
+    """A file read from the checkout, with the same shape as a langchain Document"""
+
+    __slots__ = ("page_content", "metadata")
+
+    def __init__(self, page_content, metadata):
+        self.page_content = page_content
+        self.metadata = metadata
+
+
 class GithubLoader:
     def __init__(self):
         """
-        this class is responsible for loading in a github repository
+        this class is responsible for loading in a github repository.
+        every loader checks the repository out into its own workspace; call cleanup() when done
         """
+        self.workspace = None
 
     def load(self, url: str):
-        tmp_path = f"/tmp/github_repo"
-        # remove the folder if it exists
-        if os.path.exists(tmp_path):
-            os.system(f"rm -rf {tmp_path}")
-        
-        # Clean the URL to get the base repository URL
-        # Remove /tree/main, /tree/master, /blob/main, etc.
-        import re
-        clean_url = re.sub(r'/(tree|blob)/(main|master|develop|dev).*$', '', url)
-        # Remove trailing slash
-        clean_url = clean_url.rstrip('/')
-        
+        # GitPython is only needed once a repository is actually cloned
+        from git import Repo
+
+        self.workspace = tempfile.mkdtemp(prefix="github_repo_", dir=REPO_WORKSPACE_DIR)
+        tmp_path = os.path.join(self.workspace, "repo")
+
+        clean_url = clean_github_url(url)
         print(f"Original URL: {url}")
         print(f"Cleaned URL: {clean_url}")
-        
+
+        try:
+            # Clone from the local mirror; objects are hard-linked, so this needs no network
+            mirror_path = update_mirror(clean_url)
+            with _mirror_lock(mirror_path):
+                repo = Repo.clone_from(mirror_path, to_path=tmp_path)
+        except Exception as e:
+            print(f"Error using the mirror cache for {clean_url}: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            repo = self._shallow_clone(clean_url, tmp_path)
+        self.repo = repo
+        self.repo_path = tmp_path
+        return repo
+
+    def _shallow_clone(self, clean_url, tmp_path):
+        """Clone the repository straight from the network, without the mirror cache"""
+        from git import Repo
+
         try:
             repo = Repo.clone_from(
                 clean_url,
@@ -47,9 +182,6 @@ class GithubLoader:
         except Exception as e:
             print(f"Error cloning repository with gitpython: {e}")
             # Try with a longer timeout and different options
-            import subprocess
-            import shutil
-            
             # Remove the failed directory
             if os.path.exists(tmp_path):
                 shutil.rmtree(tmp_path)
@@ -96,14 +228,88 @@ class GithubLoader:
                     raise Exception(f"All git clone methods failed for {clean_url}: {e2}")
             except Exception as e:
                 raise Exception(f"Failed to clone repository {clean_url}: {e}")
-        branch = repo.head.reference
+        return repo
+
+    def cleanup(self):
+        """Delete this loader's workspace"""
+        if self.workspace:
+            shutil.rmtree(self.workspace, ignore_errors=True)
+            self.workspace = None
+
+    @property
+    def head_commit(self):
+        """SHA of the commit that was checked out"""
+        return self.repo.head.commit.hexsha
+
+    def iter_documents(self, paths=None):
+        """Lazily yield the text files of the checkout, optionally only the given repo-relative paths.
+
+        Files are read one at a time, so memory does not grow with the size of the repository.
+        Files that are not valid UTF-8 (binaries) are skipped.
+        """
+        if paths is None:
+            paths = self.list_files()
+        for path in paths:
+            if not file_filter(path):
+                continue
+            file_path = os.path.join(self.repo_path, path)
+            try:
+                with open(file_path, "rb") as f:
+                    content = f.read().decode("utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            yield SourceDocument(content, {
+                "source": path,
+                "file_path": path,
+                "file_name": os.path.basename(path),
+                "file_type": os.path.splitext(path)[1],
+            })
+
+    def list_files(self):
+        """Repo-relative paths of every tracked file that passes the file filter"""
+        # -z keeps paths with non-ASCII characters, quotes or newlines unquoted
+        return [path for path in self.repo.git.ls_files("-z").split("\0") if path and file_filter(path)]
+
+    def changed_paths(self, since_sha):
+        """Paths added, modified and deleted between since_sha and the checked-out commit.
+
+        Returns None when the diff cannot be computed (for example if since_sha
+        no longer exists upstream), in which case the repo must be fully re-indexed.
+        """
+        changes = {"added": [], "modified": [], "deleted": []}
+        if since_sha == self.head_commit:
+            return changes
+        try:
+            try:
+                self.repo.git.cat_file("-e", f"{since_sha}^{{commit}}")
+            except Exception:
+                # Shallow clones lack history, so fetch the old commit before diffing against it
+                self.repo.git.fetch("--depth=1", "origin", since_sha)
+            output = self.repo.git.diff("-z", "--name-status", "--no-renames", since_sha, "HEAD")
+        except Exception as e:
+            print(f"Could not diff against {since_sha}: {e}")
+            return None
 
-        loader = GitLoader(repo_path=tmp_path, branch=branch, file_filter=file_filter)
-        return loader
+        # NUL-separated status and path fields; renames and copies are followed by two paths
+        fields = iter(output.split("\0"))
+        for status in fields:
+            if not status:
+                continue
+            if status[0] in "RC":
+                old_path, path = next(fields), next(fields)
+                if status[0] == "R":
+                    changes["deleted"].append(old_path)
+                changes["added"].append(path)
+            elif status.startswith("A"):
+                changes["added"].append(next(fields))
+            elif status.startswith("D"):
+                changes["deleted"].append(next(fields))
+            else:
+                changes["modified"].append(next(fields))
+        return changes
 
 
 # github_loader = GithubLoader()
-# loader = github_loader.load("https://github.com/travisleow/codehub")
-# docs = loader.load()
-# for doc in docs:
+# github_loader.load("https://github.com/travisleow/codehub")
+# for doc in github_loader.iter_documents():
 #     print(doc.metadata["source"])
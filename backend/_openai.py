@@ -1,42 +1,45 @@
-import weaviate
-from weaviate import WeaviateClient
-from openai_utils import get_embeddings, create_chat_completion, create_context_system_prompt
-
-# Initialize Weaviate client for local instance
-try:
-    client = WeaviateClient(
-        connection_params=weaviate.connect.ConnectionParams.from_url(
-            url="http://localhost:8080",
-            grpc_port=50051
-        )
-    )
-    
-    # Connect to Weaviate
-    client.connect()
-    
-    # Check if collection exists, if not create it
-    try:
-        index = client.collections.get("chatpdf")
-        print("✅ Connected to Weaviate successfully")
-    except Exception as e:
-        print(f"⚠️ Collection 'chatpdf' not found, creating it...")
-        # Create the collection
-        client.collections.create(
-            name="chatpdf",
-            properties=[
-                {"name": "source", "dataType": ["text"]},
-                {"name": "code", "dataType": ["text"]},
-                {"name": "summary", "dataType": ["text"]}
-            ],
-            vectorizer_config=weaviate.config.Configure.Vectorizer.none()
-        )
-        index = client.collections.get("chatpdf")
-        print("✅ Created and connected to Weaviate collection")
-        
-except Exception as e:
-    print(f"⚠️ Warning: Could not connect to Weaviate: {e}")
-    print("💡 Make sure Weaviate is running with: docker-compose -f weaviate-docker-compose.yml up")
-    index = None
+import os
+import json
+import asyncio
+import hashlib
+from disk_cache import DiskCache
+from vector_store import get_vector_store
+from openai_utils import get_embeddings, create_chat_completion, stream_chat_completion, create_context_system_prompt, CHAT_MODEL
+from tokens import chunk_by_tokens
+from rate_limiter import LLMUnavailableError
+from index_state import get_indexed_commit
+from answer_cache import AnswerCache
+from github_client import fetch_commit_diff
+from diff_compactor import compact_diff
+from context_builder import Candidate, build_context, CONTEXT_MAX_TOKENS
+
+# Bump whenever the summary prompt changes so cached summaries are regenerated
+SUMMARY_PROMPT_VERSION = 2
+
+# Files longer than SUMMARY_CHUNK_TOKENS are summarised chunk by chunk and the chunk summaries combined;
+# only the first SUMMARY_MAX_CHUNKS chunks of very large (usually generated) files are read
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+SUMMARY_MAX_CHUNKS = int(os.getenv("SUMMARY_MAX_CHUNKS", "8"))
+
+# Number of files retrieved as context for a question, and the cosine distance beyond which a file is ignored
+ASK_TOP_K = int(os.getenv("ASK_TOP_K", "5"))
+ASK_MAX_DISTANCE = float(os.getenv("ASK_MAX_DISTANCE", "0.5"))
+# Answers to repeated questions about the same indexed revision are reused
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000")),
+    ttl_seconds=int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 60 * 60))),
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+)
+STORE_UNAVAILABLE_ANSWER = "I'm sorry, but I'm unable to process your request at the moment due to Weaviate connection issues."
+
+# Bump whenever the commit summary prompt or its input changes
+COMMIT_SUMMARY_VERSION = 2
+# Diffs are compacted to this many tokens before they are summarised
+COMMIT_DIFF_MAX_TOKENS = int(os.getenv("COMMIT_DIFF_MAX_TOKENS", "3000"))
+
+summary_cache = DiskCache("summaries", int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(256 * 1024 * 1024))))
+# Commit contents never change, so their summaries are kept until evicted for space
+commit_summary_cache = DiskCache("commit_summaries", int(os.getenv("COMMIT_SUMMARY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
 
 
 async def getEmbeddings(text):
@@ -44,20 +47,26 @@ async def getEmbeddings(text):
     return await get_embeddings(text)
 
 
-async def getSummary(source, code):
-    """Generate a summary for a code file"""
-    print("getting summary for", source)
-    if len(code) > 10000:
-        code = code[:10000]
-    
+def summary_cache_key(source, code, model=CHAT_MODEL):
+    """Content-addressed key for the summary of a file"""
+    payload = json.dumps([source, code, SUMMARY_PROMPT_VERSION, model])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+SUMMARY_SYSTEM_PROMPT = "You are an intelligent senior software engineer who specialise in onboarding junior software engineers onto projects"
+
+
+async def _summarise_chunk(source, code, part=None):
+    """Summarise one file, or one part of a file split into several"""
+    if part is None:
+        subject = f"the purpose of the {source} file"
+    else:
+        subject = f"part {part[0]} of {part[1]} of the {source} file"
     messages = [
-        {
-            "role": "system",
-            "content": "You are an intelligent senior software engineer who specialise in onboarding junior software engineers onto projects",
-        },
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
         {
             "role": "user",
-            "content": f"""You are onboarding a junior software engineer and explaining to them the purpose of the {source} file
+            "content": f"""You are onboarding a junior software engineer and explaining to them {subject}
         here is the code:
         ---
         {code}
@@ -66,52 +75,163 @@ async def getSummary(source, code):
         """,
         },
     ]
-    
-    result = await create_chat_completion(messages)
+    return await create_chat_completion(messages, background=True)
+
+
+async def _combine_summaries(source, summaries):
+    """Reduce the summaries of a file's parts into one summary of the whole file"""
+    parts = "\n".join(f"part {i + 1}: {summary}" for i, summary in enumerate(summaries))
+    messages = [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"""You are onboarding a junior software engineer and explaining to them the purpose of the {source} file
+        the file was too long to read at once, so here are summaries of its parts in order:
+        ---
+        {parts}
+        ---
+        give a summary no more than 100 words of the whole file
+        """,
+        },
+    ]
+    return await create_chat_completion(messages, background=True)
+
+
+async def getSummary(source, code):
+    """Generate a summary for a code file, reusing the cached one if the file is unchanged.
+
+    Large files are split into token-bounded chunks that are summarised in
+    parallel and then combined, so no prompt exceeds SUMMARY_CHUNK_TOKENS of code.
+    """
+    # Hashing, tokenising and the cache lookups are slow for large generated files, so they run off the event loop
+    cache_key = await asyncio.to_thread(summary_cache_key, source, code)
+    cached = await asyncio.to_thread(summary_cache.get, cache_key)
+    if cached is not None:
+        return cached.decode("utf-8")
+
+    print("getting summary for", source)
+    # LLMUnavailableError propagates so a failed request is never stored as a summary
+    chunks = await asyncio.to_thread(chunk_by_tokens, code, SUMMARY_CHUNK_TOKENS, CHAT_MODEL)
+    if len(chunks) == 1:
+        result = await _summarise_chunk(source, code)
+    else:
+        chunks = chunks[:SUMMARY_MAX_CHUNKS]
+        summaries = await asyncio.gather(
+            *[_summarise_chunk(source, chunk, (i + 1, len(chunks))) for i, chunk in enumerate(chunks)]
+        )
+        summaries = [summary for summary in summaries if summary]
+        result = await _combine_summaries(source, summaries) if summaries else None
     if result:
         print("got back summary", source)
+        await asyncio.to_thread(summary_cache.set, cache_key, result.encode("utf-8"))
         return result
     else:
         return f"File: {source} - Code file with {len(code)} characters"
 
 
-async def ask(query, namespace):
-    """Ask a question about the codebase using vector search"""
-    if index is None:
-        return "I'm sorry, but I'm unable to process your request at the moment due to Weaviate connection issues."
-    
-    query_vector = await getEmbeddings(query)
-    if query_vector is None:
-        return "I'm sorry, but I'm unable to process your request at the moment due to API limitations."
-    
-    # Try to get all objects and manually filter by vector similarity
-    all_objects = index.query.fetch_objects(limit=100)
-    print(f"Total objects in database: {len(all_objects.objects)}")
-    
-    # For now, just get the first few objects as context
-    query_response = type('obj', (object,), {
-        'objects': all_objects.objects[:5]  # Get first 5 objects as context
-    })()
-    # form context from the top 10 results
-    context = ""
-    print(f"Found {len(query_response.objects)} results for query: {query}")
-    for r in query_response.objects:
-        context += f"""source:{r.properties['properties']['source']}\ncode content:{r.properties['properties']['code']}\nsummary of file:{r.properties['properties']['summary']}\n\n"""
-    print("asking", query)
-    print("Context length:", len(context))
-    
+def format_context(query, hits, max_tokens=CONTEXT_MAX_TOKENS):
+    """Context block for a question from its retrieved files, kept within max_tokens"""
+    candidates = [
+        Candidate(
+            key=hit.properties["source"],
+            header=f"source:{hit.properties['source']}",
+            distance=hit.distance,
+            summary=hit.properties.get("summary") or "",
+            body=hit.properties.get("code") or "",
+        )
+        for hit in hits
+    ]
+    return build_context(candidates, query, max_tokens, CHAT_MODEL)
+
+
+def _answer_messages(query, context):
     system_prompt = create_context_system_prompt(context)
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": query},
     ]
+
+
+async def answer_with_context(query, context):
+    """Answer a question from an already retrieved context"""
+    print("asking", query)
+    print("Context length:", len(context))
+    result = await create_chat_completion(_answer_messages(query, context))
+    print("got back answer")
+    return result
+
+
+async def prepare_answer(query, namespace, k=ASK_TOP_K):
+    """Look a question up in the answer cache, retrieving its context on a miss.
+
+    Returns a dict holding either a ready "answer" or the "context" to answer it
+    from, plus what remember_answer needs to cache the generated answer.
+    """
+    store = await asyncio.to_thread(get_vector_store, "chatpdf")
+    if store is None:
+        return {"answer": STORE_UNAVAILABLE_ANSWER}
+
+    # Answers are only cached for repositories whose indexed revision in this store is known
+    commit_sha = await asyncio.to_thread(get_indexed_commit, namespace, store.store_id)
+    if commit_sha:
+        cached = answer_cache.get_exact(namespace, commit_sha, query)
+        if cached is not None:
+            return {"answer": cached}
+
+    query_vector = await getEmbeddings(query)
+    if query_vector is None:
+        raise LLMUnavailableError("Could not embed the question")
+    if commit_sha:
+        cached = answer_cache.get_similar(namespace, commit_sha, query_vector)
+        if cached is not None:
+            return {"answer": cached}
     
-    result = await create_chat_completion(messages)
-    if result:
-        print("got back answer")
-        return result
-    else:
-        return f"I'm sorry, but I'm unable to process your request at the moment due to API limitations. Please try again later or contact support."
+    results = await asyncio.to_thread(
+        store.query, namespace, query_vector, k, ASK_MAX_DISTANCE, ["source", "code", "summary"]
+    )
+    context = format_context(query, results)
+    print(f"Found {len(results)} results for query: {query}, context uses {context.tokens} tokens from {context.included} files")
+    return {"answer": None, "context": context.text, "commit_sha": commit_sha, "vector": query_vector}
+
+
+def remember_answer(query, namespace, prepared, answer):
+    if prepared["commit_sha"] and answer:
+        answer_cache.set(namespace, prepared["commit_sha"], query, prepared["vector"], answer)
+
+
+async def ask(query, namespace, k=ASK_TOP_K):
+    """Ask a question about the codebase using vector search"""
+    prepared = await prepare_answer(query, namespace, k)
+    if prepared["answer"] is not None:
+        return prepared["answer"]
+    answer = await answer_with_context(query, prepared["context"])
+    remember_answer(query, namespace, prepared, answer)
+    return answer
+
+
+async def ask_stream(query, namespace, k=ASK_TOP_K):
+    """Like ask, but yield the answer piece by piece as the model generates it"""
+    prepared = await prepare_answer(query, namespace, k)
+    if prepared["answer"] is not None:
+        yield prepared["answer"]
+        return
+    print("streaming answer to", query)
+    parts = []
+    async for text in stream_chat_completion(_answer_messages(query, prepared["context"])):
+        parts.append(text)
+        yield text
+    remember_answer(query, namespace, prepared, "".join(parts))
+
+
+async def retrieve_contexts(store, namespace, queries, vectors, k=ASK_TOP_K):
+    """Contexts for several questions and their precomputed vectors, retrieved in one batched query"""
+    results = await asyncio.to_thread(
+        store.query_many, namespace, vectors, k, ASK_MAX_DISTANCE, ["source", "code", "summary"]
+    )
+    contexts = [format_context(query, hits) for query, hits in zip(queries, results)]
+    distinct = len({hit.uuid for hits in results for hit in hits})
+    print(f"Retrieved {distinct} distinct files for {len(vectors)} questions, {sum(c.tokens for c in contexts)} context tokens")
+    return [context.text for context in contexts]
 
 
 async def summarise_commit(diff):
@@ -157,8 +277,26 @@ async def summarise_commit(diff):
         },
     ]
     
-    result = await create_chat_completion(messages)
-    if result:
-        return result
-    else:
-        return f"Commit changes: {len(diff)} characters modified"
+    return await create_chat_completion(messages, background=True)
+
+
+def commit_summary_key(github_url, commit_hash):
+    """Cache key of a commit's summary; the same repository may be written with or without .git or a trailing slash"""
+    repo = github_url.strip().rstrip("/").removesuffix(".git").lower()
+    payload = json.dumps([repo, commit_hash.lower(), COMMIT_SUMMARY_VERSION, CHAT_MODEL])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def summarise_commit_by_hash(github_url, commit_hash):
+    """Summarise a commit of a GitHub repository, fetching its diff unless the summary is cached"""
+    cache_key = commit_summary_key(github_url, commit_hash)
+    cached = commit_summary_cache.get(cache_key)
+    if cached is not None:
+        return cached.decode("utf-8")
+
+    diff = await fetch_commit_diff(github_url, commit_hash)
+    compacted = await asyncio.to_thread(compact_diff, diff, COMMIT_DIFF_MAX_TOKENS, CHAT_MODEL)
+    summary = await summarise_commit(compacted)
+    if summary:
+        commit_summary_cache.set(cache_key, summary.encode("utf-8"))
+    return summary
@@ -0,0 +1,126 @@
+"""
+Cache of /ask answers scoped to the repository revision they were generated from
+"""
+import time
+from collections import OrderedDict
+from embedding_cache import normalize_text
+
+
+def _unit(vector):
+    # numpy is only loaded once a question is actually cached or looked up
+    import numpy as np
+
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector)) or 1.0
+    return vector / norm
+
+
+class AnswerCache:
+    """In-process LRU of answers keyed by (namespace, commit SHA, normalized question).
+
+    A lookup first tries the exact normalized question, which needs no embedding,
+    then the most similar cached question of the same revision whose cosine
+    similarity is at least similarity_threshold. Entries older than ttl_seconds
+    are ignored, and a namespace is dropped entirely when it is re-indexed.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, similarity_threshold):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()
+        # (namespace, commit SHA) -> keys of its entries, and the matrix of their vectors once built
+        self._revisions = {}
+        self._matrices = {}
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(namespace, commit_sha, query):
+        return (namespace, commit_sha, normalize_text(query).lower())
+
+    def _remove(self, key):
+        del self._entries[key]
+        revision = key[:2]
+        keys = self._revisions[revision]
+        del keys[key]
+        if not keys:
+            del self._revisions[revision]
+        self._matrices.pop(revision, None)
+
+    def _fresh(self, key, entry):
+        if time.time() - entry["created_at"] <= self.ttl_seconds:
+            return True
+        self._remove(key)
+        self.evictions += 1
+        return False
+
+    def _matrix(self, revision):
+        """Keys of a revision and a float32 matrix of their unit vectors, one row each"""
+        if revision not in self._matrices:
+            import numpy as np
+
+            keys = list(self._revisions[revision])
+            self._matrices[revision] = (keys, np.stack([self._entries[key]["vector"] for key in keys]))
+        return self._matrices[revision]
+
+    def get_exact(self, namespace, commit_sha, query):
+        """Return the answer cached for this exact question, or None"""
+        key = self._key(namespace, commit_sha, query)
+        entry = self._entries.get(key)
+        if entry is None or not self._fresh(key, entry):
+            return None
+        self._entries.move_to_end(key)
+        self.exact_hits += 1
+        return entry["answer"]
+
+    def get_similar(self, namespace, commit_sha, vector):
+        """Return the answer of the most similar cached question above the threshold, or None"""
+        best_key = None
+        revision = (namespace, commit_sha)
+        if revision in self._revisions:
+            keys, matrix = self._matrix(revision)
+            similarities = matrix @ _unit(vector)
+            # Best match first; expired entries are dropped on the way
+            for i in similarities.argsort()[::-1]:
+                if similarities[i] < self.similarity_threshold:
+                    break
+                if self._fresh(keys[i], self._entries[keys[i]]):
+                    best_key = keys[i]
+                    break
+        if best_key is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(best_key)
+        self.semantic_hits += 1
+        return self._entries[best_key]["answer"]
+
+    def set(self, namespace, commit_sha, query, vector, answer):
+        key = self._key(namespace, commit_sha, query)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = {"vector": _unit(vector), "answer": answer, "created_at": time.time()}
+        self._revisions.setdefault(key[:2], {})[key] = None
+        self._matrices.pop(key[:2], None)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, namespace):
+        """Forget every answer about a namespace, e.g. after it was re-indexed"""
+        for revision in [revision for revision in self._revisions if revision[0] == namespace]:
+            for key in list(self._revisions[revision]):
+                self._remove(key)
+
+    def stats(self):
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+        }
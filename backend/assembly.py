@@ -1,163 +1,247 @@
-# Start by making sure the `assemblyai` package is installed.
 import os
-import weaviate
-from openai_utils import get_embeddings, create_chat_completion, create_context_system_prompt
-
-# Initialize Weaviate client for local instance
-try:
-    client = weaviate.WeaviateClient(
-        connection_params=weaviate.connect.ConnectionParams.from_url(
-            url="http://localhost:8080",
-            grpc_port=50051
-        )
-    )
-    
-    # Connect to Weaviate
-    client.connect()
-    
-    # Check if collection exists, if not create it
-    try:
-        index = client.collections.get("chatpdf")
-        print("✅ Connected to Weaviate successfully")
-    except Exception as e:
-        print(f"⚠️ Collection 'chatpdf' not found, creating it...")
-        # Create the collection
-        client.collections.create(
-            name="chatpdf",
-            properties=[
-                {"name": "source", "dataType": ["text"]},
-                {"name": "code", "dataType": ["text"]},
-                {"name": "summary", "dataType": ["text"]}
-            ],
-            vectorizer_config=weaviate.config.Configure.Vectorizer.none()
-        )
-        index = client.collections.get("chatpdf")
-        print("✅ Created and connected to Weaviate collection")
-        
-except Exception as e:
-    print(f"⚠️ Warning: Could not connect to Weaviate: {e}")
-    print("💡 Make sure Weaviate is running with: docker-compose -f weaviate-docker-compose.yml up")
-    index = None
+import asyncio
+from openai_utils import get_embeddings, get_embeddings_batch, create_chat_completion, create_context_system_prompt, CHAT_MODEL
+from vector_store import get_vector_store
+from rate_limiter import LLMUnavailableError
+from ingestion import BatchWriter
+from context_builder import Candidate, build_context, CONTEXT_MAX_TOKENS
+from transcription import get_transcription_service, wait_for_transcript, TRANSCRIPTION_WEBHOOK_URL
+
+
+# Transcript chunks live apart from code, one tenant per meeting
+MEETING_COLLECTION = "meeting_chunks"
+# Size of the timestamped transcript chunks, and how much of each is repeated at the start of the next
+MEETING_CHUNK_CHARS = int(os.getenv("MEETING_CHUNK_CHARS", "800"))
+MEETING_CHUNK_OVERLAP_CHARS = int(os.getenv("MEETING_CHUNK_OVERLAP_CHARS", "130"))
+# Chapters picked in the first stage of a meeting question, and chunks searched within them in the second
+MEETING_CHAPTERS_K = int(os.getenv("MEETING_CHAPTERS_K", "2"))
+MEETING_CHUNKS_K = int(os.getenv("MEETING_CHUNKS_K", "6"))
 
 
 def serialise_url(url):
     return url.replace("/", "_")
 
 
-# If not, you can install it by running the following command:
-# pip install -U assemblyai
-#
-# Note: Some macOS users may need to use `pip3` instead of `pip`.
 def ms_to_time(ms):
-    seconds = ms / 1000
-    minutes = seconds / 60
-    seconds = seconds % 60
-    minutes = minutes % 60
-    # format time
+    """mm:ss, or h:mm:ss from the first hour on"""
+    hours, rest = divmod(int(ms) // 1000, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return "%d:%02d:%02d" % (hours, minutes, seconds)
     return "%02d:%02d" % (minutes, seconds)
 
 
-import assemblyai as aai
+def chapter_summaries(transcript):
+    """Chapters of a completed transcript, with times formatted by ms_to_time"""
+    return [
+        {
+            "start": ms_to_time(chapter["start"]),
+            "end": ms_to_time(chapter["end"]),
+            "gist": chapter["gist"],
+            "headline": chapter["headline"],
+            "summary": chapter["summary"],
+        }
+        for chapter in transcript.get("chapters") or []
+    ]
 
-# Replace with your API token
-aai.settings.api_key = os.getenv("AAI_TOKEN")
 
+def _transcript_words(transcript):
+    """Timed words of a transcript; without word timings the text is split into untimed words"""
+    words = transcript.get("words")
+    if words:
+        return [(word["text"], word["start"], word["end"]) for word in words]
+    return [(text, None, None) for text in (transcript.get("text") or "").split()]
+
+
+def _chunk_words(words, chapter):
+    """Group consecutive words into chunks of about MEETING_CHUNK_CHARS with a little overlap"""
+    chunks = []
+    current = []
+    size = 0
+    fresh = 0
+    for word in words:
+        current.append(word)
+        size += len(word[0]) + 1
+        fresh += 1
+        if size >= MEETING_CHUNK_CHARS:
+            chunks.append(current)
+            # Carry the last few words over so a sentence cut at the boundary is still found
+            overlap = []
+            overlap_size = 0
+            for w in reversed(current):
+                if overlap_size + len(w[0]) + 1 > MEETING_CHUNK_OVERLAP_CHARS:
+                    break
+                overlap.insert(0, w)
+                overlap_size += len(w[0]) + 1
+            current, size, fresh = overlap, overlap_size, 0
+    if fresh:
+        chunks.append(current)
+    entries = []
+    for chunk in chunks:
+        entry = {
+            "text": " ".join(w[0] for w in chunk),
+            "chapter": chapter,
+            "start": ms_to_time(chunk[0][1]) if chunk[0][1] is not None else "",
+            "end": ms_to_time(chunk[-1][2]) if chunk[-1][2] is not None else "",
+        }
+        if chunk[0][1] is not None:
+            # Numeric, so snippets can be put back in the order they were said
+            entry["start_ms"] = int(chunk[0][1])
+        entries.append(entry)
+    return entries
+
+
+def transcript_levels(transcript):
+    """Split a transcript into a coarse level of chapter summaries and a fine level of timestamped chunks.
+
+    Chunks never cross a chapter boundary, and each records the chapter it belongs to,
+    so a search can be narrowed to the chapters relevant to a question.
+    """
+    chapters = transcript.get("chapters") or []
+    words = _transcript_words(transcript)
+    if not words:
+        return [], []
+    if not chapters or words[0][1] is None:
+        # Chunks that cannot be placed in a chapter are searched as one flat level
+        return [], _chunk_words(words, "0")
+
+    summaries = [
+        {
+            "text": f"{chapter['headline']}\n{chapter['summary']}",
+            "chapter": str(i),
+            "start": ms_to_time(chapter["start"]),
+            "end": ms_to_time(chapter["end"]),
+        }
+        for i, chapter in enumerate(chapters)
+    ]
+    # Words before the first chapter join it, words after a chapter ends join the one they precede
+    by_chapter = [[] for _ in chapters]
+    i = 0
+    for word in words:
+        while i + 1 < len(chapters) and word[1] >= chapters[i + 1]["start"]:
+            i += 1
+        by_chapter[i].append(word)
+    chunks = [chunk for i, chapter_words in enumerate(by_chapter) for chunk in _chunk_words(chapter_words, str(i))]
+    return summaries, chunks
+
+
+async def index_transcript(url, transcript):
+    """Embed and store a completed transcript's chapters and timestamped chunks so questions can be asked about the meeting"""
+    store = await asyncio.to_thread(get_vector_store, MEETING_COLLECTION)
+    if store is None:
+        print("⚠️ Warning: Weaviate not connected, skipping audio data insertion")
+        return
 
-async def transcribe_file(url):
-    config = aai.TranscriptionConfig(auto_chapters=True)
-    transcriber = aai.Transcriber(config=config)
-    transcript = transcriber.transcribe(url)
-    summaries = []
-    for chapter in transcript.chapters:
-        summaries.append(
-            {
-                "start": ms_to_time(chapter.start),
-                "end": ms_to_time(chapter.end),
-                "gist": chapter.gist,
-                "headline": chapter.headline,
-                "summary": chapter.summary,
-            }
-        )
+    chapters, chunks = transcript_levels(transcript)
+    entries = [{**chapter, "level": "chapter"} for chapter in chapters] + [{**chunk, "level": "chunk"} for chunk in chunks]
 
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    print("getting embeddings for audio")
+    embeddings = await get_embeddings_batch([entry["text"] for entry in entries], background=True)
+    # Skip chunks whose embeddings failed instead of dropping the whole meeting
+    failed = sum(1 for emb in embeddings if emb is None)
+    if failed:
+        print(f"Warning: {failed} audio embeddings failed, skipping those chunks")
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=130)
-    docs = splitter.create_documents([transcript.text])
-    import asyncio
+    # Transcribing the same recording again replaces its chunks
+    namespace = serialise_url(url)
+    await asyncio.to_thread(store.delete, namespace)
+    async with BatchWriter(store, namespace) as writer:
+        for entry, embedding in zip(entries, embeddings):
+            if embedding is None:
+                continue
+            await writer.put({
+                "properties": entry,
+                "vector": embedding
+            })
+    print("ingestion stats", writer.stats())
+    for failure in writer.failures:
+        print(f"Error inserting audio chunk: {failure['error']}")
+    print(f"upserted {len(chapters)} chapters and {len(chunks)} audio chunks")
+
+
+async def transcribe_file(url, progress=None):
+    """Transcribe a meeting and index it, returning its chapter summaries.
+
+    The transcript is submitted and awaited without blocking the event loop, so
+    this is meant to run as a background job; progress records its stage.
+    """
+    progress = progress if progress is not None else {}
+    service = get_transcription_service()
+    progress["stage"] = "submitting"
+    transcript_id = await service.submit(url, webhook_url=TRANSCRIPTION_WEBHOOK_URL)
+    progress["transcript_id"] = transcript_id
+    progress["stage"] = "transcribing"
+    transcript = await wait_for_transcript(transcript_id, service)
+
+    progress["stage"] = "indexing"
+    summaries = chapter_summaries(transcript)
+    await index_transcript(url, transcript)
+    progress["stage"] = "done"
+    return summaries
+
+
+MEETING_PROPERTIES = ["text", "chapter", "start", "end", "start_ms"]
 
-    embeddings = await asyncio.gather(
-        *[get_embeddings(doc.page_content) for doc in docs]
+
+async def select_chapters(store, namespace, query_vector, quote_vector=None):
+    """First stage: the chapters a question is about, starting with the one holding the quoted passage"""
+    selected = []
+    if quote_vector is not None:
+        quoted = await asyncio.to_thread(
+            store.query, namespace, quote_vector, 1, None, MEETING_PROPERTIES, {"level": "chunk"}
+        )
+        selected += [hit.properties["chapter"] for hit in quoted]
+    chapters = await asyncio.to_thread(
+        store.query, namespace, query_vector, MEETING_CHAPTERS_K, None, MEETING_PROPERTIES, {"level": "chapter"}
     )
-    print("getting embeddings for audio")
-    
-    # Check if any embeddings failed
-    if any(emb is None for emb in embeddings):
-        print("Warning: Some audio embeddings failed, skipping Weaviate insertion")
-        return summaries
-    
-    for i, doc in enumerate(docs):
-        doc.metadata["embeddings"] = embeddings[i]
-    import hashlib
-
-    # Prepare data for upsert
-    objects_to_upsert = []
-    for doc in docs:
-        objects_to_upsert.append({
-            "properties": {
-                "page_content": doc.page_content,
-                "vector": doc.metadata["embeddings"]
-            }
-        })
-    
-    # Upsert the objects using the correct method
-    if index is None:
-        print("⚠️ Warning: Weaviate not connected, skipping audio data insertion")
-    else:
-        try:
-            index.data.insert_many(objects_to_upsert)
-        except Exception as e:
-            print(f"Error inserting data into Weaviate: {e}")
-            # Fallback: insert one by one
-            for obj in objects_to_upsert:
-                try:
-                    index.data.insert(obj)
-                except Exception as insert_error:
-                    print(f"Error inserting individual object: {insert_error}")
-    print("upserted audio embeddings")
-    return summaries
+    for hit in chapters:
+        if len(selected) < MEETING_CHAPTERS_K and hit.properties["chapter"] not in selected:
+            selected.append(hit.properties["chapter"])
+    return selected, {hit.properties["chapter"]: hit for hit in chapters}
 
 
 async def ask_meeting(url, query, quote):
+    """Answer a question about a meeting, searching only the transcript of the chapters it concerns"""
     namespace = serialise_url(url)
 
-    if index is None:
+    store = await asyncio.to_thread(get_vector_store, MEETING_COLLECTION)
+    if store is None:
         return "I'm sorry, but I'm unable to process your question at the moment due to Weaviate connection issues."
-    
-    query_vector = await get_embeddings(query)
+
+    query_vector, quote_vector = await get_embeddings_batch([query, quote]) if quote else (await get_embeddings(query), None)
     if query_vector is None:
-        return "I'm sorry, but I'm unable to process your question at the moment due to API limitations."
-    
-    query_response = index.query.near_vector(
-        query_vector,
-        limit=10,
-        return_properties=["page_content"]
+        raise LLMUnavailableError("Could not embed the question")
+
+    selected, chapter_hits = await select_chapters(store, namespace, query_vector, quote_vector)
+    # Second stage: fine-grained chunks, restricted to the chosen chapters when the meeting has any
+    where = {"level": "chunk", "chapter": selected} if selected else {"level": "chunk"}
+    results = await asyncio.to_thread(
+        store.query, namespace, query_vector, MEETING_CHUNKS_K, None, MEETING_PROPERTIES, where
     )
-    context = ""
-    for r in query_response.objects:
-        context += f"""meeting snippet: {r.properties["page_content"]}\n"""
-    system_prompt = create_context_system_prompt(context)
+
+    candidates = []
+    for chapter in selected:
+        if chapter in chapter_hits:
+            hit = chapter_hits[chapter]
+            header = f"chapter [{hit.properties['start']}-{hit.properties['end']}]:"
+            candidates.append(Candidate(f"chapter:{chapter}", header, hit.distance, summary=hit.properties["text"], summary_label=""))
+    # Snippets are chosen by relevance but shown in the order they were said
+    for r in sorted(results, key=lambda hit: (int(hit.properties["chapter"]), hit.properties.get("start_ms") or 0)):
+        timestamp = f" [{r.properties['start']}-{r.properties['end']}]" if r.properties["start"] else ""
+        candidates.append(Candidate(r.uuid, f"meeting snippet{timestamp}:", r.distance, body=r.properties["text"], body_label=""))
+    context = build_context(candidates, f"{query} {quote}", CONTEXT_MAX_TOKENS, CHAT_MODEL)
+    print(f"Meeting context uses {context.tokens} tokens from {context.included} of {len(candidates)} snippets")
+    system_prompt = create_context_system_prompt(context.text)
     messages = [
         {"role": "system", "content": system_prompt},
         {
             "role": "user",
             "content": f"I am asking a question in regards to this quote in the meeting: {quote}\n here is the question:"
-            + query,
+            + query
+            + "\nCite the timestamps of the snippets you rely on, like [01:05].",
         },
     ]
-    
+
     result = await create_chat_completion(messages)
-    if result:
-        print("got back answer for", query)
-        return result
-    else:
-        return f"I'm sorry, but I'm unable to process your question at the moment due to API limitations. Please try again later."
+    print("got back answer for", query)
+    return result
@@ -0,0 +1,137 @@
+"""
+Builds the context block of a RAG prompt from retrieved hits within a token budget.
+
+Hits are deduplicated and taken in order of relevance. Summaries go in first,
+since they say the most per token; raw text is then added from the most
+relevant hits down, cut to the lines around the question's terms.
+"""
+import os
+import re
+from dataclasses import dataclass
+from tokens import count_tokens, truncate_to_tokens
+
+# Token budget of the context given to the model for one question
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+# Lines kept on each side of a line that mentions a term of the question
+CONTEXT_WINDOW_LINES = int(os.getenv("CONTEXT_WINDOW_LINES", "8"))
+# A hit's text is only added once at least this many tokens of it fit
+MIN_BODY_TOKENS = 40
+
+STOPWORDS = {
+    "the", "and", "for", "are", "was", "how", "what", "why", "when", "where", "which", "who",
+    "does", "this", "that", "with", "from", "into", "can", "you", "there", "their", "about",
+    "use", "used", "using", "have", "has", "its", "any", "all", "not", "but", "will", "would",
+}
+
+
+@dataclass
+class Candidate:
+    key: str
+    header: str
+    distance: float = 0.0
+    summary: str = ""
+    body: str = ""
+    summary_label: str = "summary of file:"
+    body_label: str = "code content:"
+
+
+@dataclass
+class BuiltContext:
+    text: str
+    tokens: int
+    included: int
+    omitted: int
+
+
+def query_terms(query):
+    """Lower-cased identifiers and words of a question worth looking for in code"""
+    terms = set()
+    for word in re.findall(r"[A-Za-z_][A-Za-z0-9_]{2,}", query):
+        # getUserName and get_user_name also match user and name
+        parts = re.findall(r"[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])", word.replace("_", " ")) + [word]
+        terms.update(part.lower() for part in parts if len(part) > 2)
+    return terms - STOPWORDS
+
+
+def relevant_windows(text, terms, window=CONTEXT_WINDOW_LINES):
+    """The lines of text around mentions of terms, in order, with "..." where lines were skipped"""
+    lines = text.splitlines()
+    matches = [i for i, line in enumerate(lines) if any(term in line.lower() for term in terms)]
+    if not matches:
+        return text
+
+    ranges = []
+    for i in matches:
+        start, end = max(0, i - window), min(len(lines), i + window + 1)
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    parts = []
+    for start, end in ranges:
+        if start > 0:
+            parts.append("...")
+        parts.extend(lines[start:end])
+    if ranges[-1][1] < len(lines):
+        parts.append("...")
+    return "\n".join(parts)
+
+
+def _render(candidate, summary, body):
+    text = candidate.header + "\n"
+    if body:
+        text += f"{candidate.body_label}{body}\n"
+    if summary:
+        text += f"{candidate.summary_label}{summary}\n"
+    return text + "\n"
+
+
+def build_context(candidates, query, max_tokens=CONTEXT_MAX_TOKENS, model="text-embedding-ada-002"):
+    """Assemble the context for query from candidates within max_tokens.
+
+    Candidates are chosen by distance but rendered in the order given, so callers
+    can keep a natural order such as the timeline of a meeting.
+    """
+    seen = set()
+    unique = []
+    for candidate in candidates:
+        fingerprint = (candidate.key, candidate.summary, candidate.body)
+        if candidate.key in seen or fingerprint in seen:
+            continue
+        seen.update([candidate.key, fingerprint])
+        unique.append(candidate)
+    ranked = sorted(range(len(unique)), key=lambda i: unique[i].distance)
+
+    terms = query_terms(query)
+    summaries = {}
+    bodies = {}
+    remaining = max_tokens
+
+    # Summaries first, and the text of hits that have no summary
+    for i in ranked:
+        candidate = unique[i]
+        if candidate.summary:
+            cost = count_tokens(_render(candidate, candidate.summary, ""), model)
+            if cost <= remaining:
+                summaries[i] = candidate.summary
+                remaining -= cost
+        elif candidate.body:
+            overhead = count_tokens(_render(candidate, "", " "), model)
+            if remaining - overhead >= MIN_BODY_TOKENS:
+                bodies[i] = truncate_to_tokens(relevant_windows(candidate.body, terms), remaining - overhead, model)
+                remaining -= overhead + count_tokens(bodies[i], model)
+
+    # Then code around the question's terms, most relevant first, while budget lasts
+    for i in ranked:
+        candidate = unique[i]
+        if i not in summaries or not candidate.body:
+            continue
+        overhead = count_tokens(f"{candidate.body_label}\n", model)
+        if remaining - overhead < MIN_BODY_TOKENS:
+            break
+        bodies[i] = truncate_to_tokens(relevant_windows(candidate.body, terms), remaining - overhead, model)
+        remaining -= overhead + count_tokens(bodies[i], model)
+
+    included = [i for i in range(len(unique)) if i in summaries or i in bodies]
+    text = "".join(_render(unique[i], summaries.get(i, ""), bodies.get(i, "")) for i in included)
+    return BuiltContext(text=text, tokens=count_tokens(text, model), included=len(included), omitted=len(unique) - len(included))
@@ -0,0 +1,176 @@
+"""
+Compacts unified diffs so a commit can be summarised within a token budget.
+
+The diff is split per file. Lockfiles, binaries, vendored and minified files are
+replaced by a one-line stub, context lines are dropped, and the remaining budget
+is shared between files in proportion to how many lines they change.
+"""
+import re
+import posixpath
+from dataclasses import dataclass, field
+from tokens import count_tokens, truncate_to_tokens
+
+LOCKFILES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "bun.lockb",
+    "Cargo.lock", "poetry.lock", "Pipfile.lock", "uv.lock", "pdm.lock", "composer.lock",
+    "Gemfile.lock", "go.sum", "mix.lock", "Podfile.lock", "packages.lock.json",
+}
+VENDORED_DIRS = {"vendor", "node_modules", "third_party", "third-party", "bower_components"}
+MINIFIED_SUFFIXES = (".min.js", ".min.css", ".map")
+# Changed lines longer than this are a sign of minified or generated content
+MINIFIED_LINE_LENGTH = 500
+# Every file that is shown at all gets at least this many tokens
+MIN_FILE_TOKENS = 60
+# Files beyond this many are only listed by name in the overflow line
+MAX_LISTED_FILES = 50
+
+_DIFF_HEADER = re.compile(r"^diff --git a/(.*?) b/(.*)$")
+
+
+@dataclass
+class FileDiff:
+    path: str
+    header: list = field(default_factory=list)
+    hunks: list = field(default_factory=list)
+    added: int = 0
+    removed: int = 0
+    binary: bool = False
+
+    @property
+    def changed(self):
+        return self.added + self.removed
+
+
+def parse_unified_diff(text):
+    """Split a unified diff into FileDiffs holding their header lines and the changed lines of each hunk"""
+    files = []
+    current = None
+    hunk = None
+    for line in text.splitlines():
+        match = _DIFF_HEADER.match(line)
+        if match:
+            current = FileDiff(path=match.group(2), header=[line])
+            files.append(current)
+            hunk = None
+        elif current is None:
+            continue
+        elif line.startswith("@@"):
+            hunk = [line]
+            current.hunks.append(hunk)
+        elif hunk is None:
+            current.header.append(line)
+            if line.startswith("Binary files") or line.startswith("GIT binary patch"):
+                current.binary = True
+        elif line.startswith("+"):
+            current.added += 1
+            hunk.append(line)
+        elif line.startswith("-"):
+            current.removed += 1
+            hunk.append(line)
+        # Context lines and "\ No newline at end of file" markers are dropped
+    return files
+
+
+def omission_reason(file):
+    """Why a file's changes are not worth showing to the model, or None"""
+    name = posixpath.basename(file.path)
+    if file.binary:
+        return "binary file"
+    if name in LOCKFILES:
+        return "lockfile"
+    if VENDORED_DIRS.intersection(file.path.split("/")[:-1]):
+        return "vendored file"
+    if name.endswith(MINIFIED_SUFFIXES) or any(
+        len(line) > MINIFIED_LINE_LENGTH for hunk in file.hunks for line in hunk[1:]
+    ):
+        return "minified or generated file"
+    return None
+
+
+def _stub(file, reason):
+    return f"{file.header[0]}\n[{reason} changed: +{file.added} -{file.removed} lines, contents omitted]\n"
+
+
+def _render(file, max_tokens=None, model="text-embedding-ada-002"):
+    """Header and changed lines of a file, cut to max_tokens at a line boundary"""
+    lines = list(file.header)
+    for hunk in file.hunks:
+        lines.extend(hunk)
+    if max_tokens is None:
+        return "\n".join(lines) + "\n"
+
+    kept = []
+    used = 0
+    for line in lines:
+        tokens = count_tokens(line, model) + 1
+        if used + tokens > max_tokens and kept:
+            break
+        kept.append(line)
+        used += tokens
+    omitted = sum(1 for line in lines[len(kept):] if line[:1] in "+-" and not line.startswith(("+++", "---")))
+    if omitted:
+        kept.append(f"[... {omitted} more changed lines omitted]")
+    return "\n".join(kept) + "\n"
+
+
+def _overflow_line(files):
+    listed = ", ".join(f"{file.path} (+{file.added} -{file.removed})" for file in files[:MAX_LISTED_FILES])
+    more = f" and {len(files) - MAX_LISTED_FILES} more" if len(files) > MAX_LISTED_FILES else ""
+    return f"[{len(files)} smaller changed files not shown: {listed}{more}]\n"
+
+
+def _allocate(sizes, weights, budget):
+    """Split budget between files: small files get all they need, larger ones share the rest by weight"""
+    allocation = {}
+    remaining = set(range(len(sizes)))
+    while remaining:
+        total_weight = sum(weights[i] for i in remaining)
+        shares = {i: budget * weights[i] / total_weight for i in remaining}
+        fitting = [i for i in remaining if sizes[i] <= shares[i]]
+        if not fitting:
+            for i in remaining:
+                allocation[i] = max(MIN_FILE_TOKENS, int(shares[i]))
+            break
+        for i in fitting:
+            allocation[i] = sizes[i]
+            budget -= sizes[i]
+            remaining.discard(i)
+    return allocation
+
+
+def compact_diff(text, max_tokens, model="text-embedding-ada-002"):
+    """Rewrite a unified diff to fit in roughly max_tokens tokens, keeping its most representative changes"""
+    files = parse_unified_diff(text)
+    if not files:
+        return truncate_to_tokens(text, max_tokens, model)
+
+    stubs = []
+    shown = []
+    for file in files:
+        reason = omission_reason(file)
+        if reason:
+            stubs.append(_stub(file, reason))
+        else:
+            shown.append(file)
+
+    # When there are too many files to show each one meaningfully, keep the most changed ones
+    budget = max(0, max_tokens - sum(count_tokens(stub, model) for stub in stubs))
+    ranked = sorted(shown, key=lambda file: file.changed, reverse=True)
+    overflow_line = ""
+    if len(shown) > max(1, budget // MIN_FILE_TOKENS):
+        # The overflow line lists at most MAX_LISTED_FILES names, so its size barely depends on the cut
+        overflow_line = _overflow_line(ranked[budget // MIN_FILE_TOKENS:])
+        budget -= count_tokens(overflow_line, model)
+        capacity = max(1, budget // MIN_FILE_TOKENS)
+        overflow_line = _overflow_line(ranked[capacity:])
+        shown = sorted(ranked[:capacity], key=files.index)
+
+    rendered = [_render(file) for file in shown]
+    sizes = [count_tokens(part, model) for part in rendered]
+    allocation = _allocate(sizes, [file.changed + 1 for file in shown], max(budget, MIN_FILE_TOKENS * len(shown)))
+
+    parts = []
+    for i, file in enumerate(shown):
+        parts.append(rendered[i] if allocation[i] >= sizes[i] else _render(file, allocation[i], model))
+    # Per-file minimums can overshoot a very small budget, so the result is still capped
+    return truncate_to_tokens("".join(parts) + "".join(stubs) + overflow_line, max_tokens, model)
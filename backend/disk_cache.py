@@ -0,0 +1,78 @@
+"""
+Persistent key/value cache stored in a local SQLite file
+"""
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Directory holding every on-disk cache used by the backend
+CACHE_DIR = os.getenv("CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+
+class DiskCache:
+    """SQLite-backed byte store that evicts least recently used entries once it grows past max_bytes"""
+
+    def __init__(self, name, max_bytes):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.path = os.path.join(CACHE_DIR, f"{name}.sqlite3")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key):
+        """Return the bytes stored under key, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def set(self, key, value):
+        """Store bytes under key, evicting old entries if the cache is over its size limit"""
+        size = len(key) + len(value)
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._size += size - (row[0] if row else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, key):
+        """Remove key from the cache if present"""
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._size -= row[0]
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes"""
+        target = self.max_bytes * 0.9
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        print(f"Evicted {len(evicted)} entries from {self.path}")
+
+    def stats(self):
+        """Return the number of entries and bytes held by the cache"""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"entries": count, "bytes": self._size, "max_bytes": self.max_bytes}
@@ -0,0 +1,81 @@
+"""
+The onboarding questions answered by /generate_documentation, one per documentation section.
+
+A deployment can replace the defaults with a JSON file named by DOC_QUESTIONS_FILE
+holding a list of {"id": ..., "title": ..., "question": ...} objects, in the order
+the sections should appear.
+"""
+import os
+import json
+from dotenv import load_dotenv
+from openai_utils import get_embeddings_batch
+from rate_limiter import LLMUnavailableError
+
+load_dotenv()
+
+DOC_QUESTIONS_FILE = os.getenv("DOC_QUESTIONS_FILE")
+
+DEFAULT_SECTIONS = [
+    {"id": "introduction", "title": "Introduction", "question": "What is the project about?"},
+    {"id": "getting-started", "title": "Getting Started", "question": "How can I get started with this project?"},
+    {"id": "repository", "title": "Repository", "question": "What does the project's repository contain?"},
+    {"id": "coding-standards", "title": "Coding Standards", "question": "Are there any coding standards or guidelines I should follow?"},
+    {"id": "dependencies", "title": "Dependencies", "question": "What dependencies, packages, APIs, or libraries does the project use? Look into the package.json file."},
+    {"id": "building-and-compiling", "title": "Building and Compiling", "question": "How can I build and compile the project?"},
+    {"id": "testing", "title": "Testing", "question": "What should I know about testing in this project?"},
+    {"id": "contributing", "title": "Contributing", "question": "How can I contribute to the project?"},
+    {"id": "issues", "title": "Issues", "question": "How are issues tracked in this project?"},
+    {"id": "version-control", "title": "Version Control", "question": "What's the version control strategy for this project?"},
+    {"id": "ci-cd", "title": "CI/CD", "question": "Tell me about the project's CI/CD pipeline."},
+    {"id": "documentation", "title": "Documentation", "question": "Where should I add documentation and comments in the codebase?"},
+]
+
+_sections = None
+_question_vectors = {}
+
+
+def load_sections():
+    """Return the configured documentation sections"""
+    global _sections
+    if _sections is None:
+        if DOC_QUESTIONS_FILE:
+            with open(DOC_QUESTIONS_FILE) as f:
+                sections = json.load(f)
+            for section in sections:
+                missing = {"id", "title", "question"} - set(section)
+                if missing:
+                    raise ValueError(f"{DOC_QUESTIONS_FILE}: section {section} is missing {sorted(missing)}")
+            _sections = sections
+        else:
+            _sections = DEFAULT_SECTIONS
+    return _sections
+
+
+async def question_vectors(sections):
+    """Embeddings of the sections' questions, computed once per process.
+
+    The embeddings are also kept in the persistent embedding cache, so a restarted
+    worker does not call the embeddings endpoint for them again either.
+    """
+    questions = tuple(section["question"] for section in sections)
+    if questions not in _question_vectors:
+        vectors = await get_embeddings_batch(list(questions))
+        if any(vector is None for vector in vectors):
+            raise LLMUnavailableError("Could not embed the documentation questions")
+        _question_vectors[questions] = vectors
+    return _question_vectors[questions]
+
+
+def render_documentation(project_name, sections, answers):
+    """HTML page with a table of contents and one section per answered question"""
+    contents = "\n".join(f'  <li><a href="#{section["id"]}">{section["title"]}</a></li>' for section in sections)
+    body = "\n".join(
+        f'  <h2 id="{section["id"]}">{section["title"]}</h2>\n  <pre>{answer}</pre>'
+        for section, answer in zip(sections, answers)
+    )
+    return f"""<h1>{project_name}</h1>
+  <ul>
+{contents}
+  </ul>
+
+{body}"""
@@ -0,0 +1,74 @@
+"""
+Two-tier embedding cache: an in-process LRU in front of a persistent on-disk store
+"""
+import hashlib
+from array import array
+from collections import OrderedDict
+from disk_cache import DiskCache
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different strings share one embedding"""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """Caches embedding vectors keyed by (model, normalized text hash), stored as float32"""
+
+    def __init__(self, max_entries, disk_max_bytes):
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._disk = DiskCache("embeddings", disk_max_bytes)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model, text):
+        payload = f"{model}\0{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, model, text):
+        """Return the cached vector for text as a list of floats, or None"""
+        key = self.key(model, text)
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return vector.tolist()
+
+        blob = self._disk.get(key)
+        if blob is not None:
+            vector = array("f")
+            vector.frombytes(blob)
+            self._remember(key, vector)
+            self.disk_hits += 1
+            return vector.tolist()
+
+        self.misses += 1
+        return None
+
+    def set(self, model, text, embedding):
+        """Store an embedding in both tiers"""
+        key = self.key(model, text)
+        vector = array("f", embedding)
+        self._remember(key, vector)
+        self._disk.set(key, vector.tobytes())
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk": self._disk.stats(),
+        }
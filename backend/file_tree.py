@@ -0,0 +1,194 @@
+"""
+Directory tree of a repository's files, rendered as a collapsed Mermaid graph or
+as JSON subtrees that the UI can expand one directory at a time.
+"""
+import os
+import json
+import threading
+from collections import OrderedDict, deque
+from disk_cache import DiskCache
+
+# Directories deeper than this below the rendered root are shown collapsed, with their file count
+FILE_TREE_MAX_DEPTH = int(os.getenv("FILE_TREE_MAX_DEPTH", "3"))
+# Entries shown per directory; the rest are folded into a single "more" node
+FILE_TREE_MAX_CHILDREN = int(os.getenv("FILE_TREE_MAX_CHILDREN", "20"))
+# Directories are expanded level by level until the graph would grow past this many nodes
+FILE_TREE_MAX_NODES = int(os.getenv("FILE_TREE_MAX_NODES", "400"))
+# Trees kept in memory; all of them are also stored on disk so subtrees survive restarts
+FILE_TREE_MEMORY_ENTRIES = 32
+
+file_tree_cache = DiskCache("file_trees", int(os.getenv("FILE_TREE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+_trees = OrderedDict()
+_trees_lock = threading.Lock()
+
+
+class TreeNode:
+    __slots__ = ("name", "path", "children", "files")
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        # None for files, name -> TreeNode for directories
+        self.children = None
+        self.files = 0
+
+    @property
+    def is_dir(self):
+        return self.children is not None
+
+    def sorted_children(self):
+        """Directories first, then files, each alphabetically"""
+        return sorted(self.children.values(), key=lambda child: (not child.is_dir, child.name.lower()))
+
+
+class FileTree:
+    """Index of a file list by directory, built once and queried for any subtree"""
+
+    def __init__(self, paths):
+        self.root = TreeNode("", "")
+        self.root.children = {}
+        for path in dict.fromkeys(paths):
+            node = self.root
+            node.files += 1
+            parts = path.strip("/").split("/")
+            for i, part in enumerate(parts):
+                child = node.children.get(part)
+                if child is None:
+                    child = node.children[part] = TreeNode(part, "/".join(parts[: i + 1]))
+                    if i < len(parts) - 1:
+                        child.children = {}
+                elif not child.is_dir:
+                    # A path listed both as a file and as a directory; keep the directory
+                    child.children = {}
+                node = child
+                if node.is_dir:
+                    node.files += 1
+
+    def node(self, path=""):
+        """The node at a repo-relative path, or None"""
+        node = self.root
+        for part in [part for part in path.strip("/").split("/") if part]:
+            if not node.is_dir or part not in node.children:
+                return None
+            node = node.children[part]
+        return node
+
+    def _visible_children(self, node, max_children):
+        children = node.sorted_children()
+        return children[:max_children], children[max_children:]
+
+    def _expanded(self, root, max_depth, max_children, max_nodes):
+        """Paths of the directories to open, breadth first, within the depth and node limits"""
+        expanded = set()
+        nodes = 1
+        queue = deque([(root, 0)])
+        while queue:
+            node, depth = queue.popleft()
+            if not node.is_dir or depth >= max_depth:
+                continue
+            shown, hidden = self._visible_children(node, max_children)
+            added = len(shown) + (1 if hidden else 0)
+            if nodes + added > max_nodes and expanded:
+                break
+            expanded.add(node.path)
+            nodes += added
+            queue.extend((child, depth + 1) for child in shown)
+        return expanded
+
+    def subtree(self, path="", max_depth=FILE_TREE_MAX_DEPTH, max_children=FILE_TREE_MAX_CHILDREN, max_nodes=FILE_TREE_MAX_NODES):
+        """JSON-ready subtree at path, at most max_depth levels deep; None if path does not exist.
+
+        Directories cut off by the depth or node limit have "children": None and
+        can be fetched with another call; entries beyond max_children are
+        summarised in one {"type": "more"} entry per directory.
+        """
+        node = self.node(path)
+        if node is None:
+            return None
+        expanded = self._expanded(node, max_depth, max_children, max_nodes)
+
+        def build(node):
+            if not node.is_dir:
+                return {"type": "file", "name": node.name, "path": node.path}
+            entry = {"type": "dir", "name": node.name, "path": node.path, "files": node.files, "children": None}
+            if node.path in expanded:
+                shown, hidden = self._visible_children(node, max_children)
+                entry["children"] = [build(child) for child in shown]
+                if hidden:
+                    entry["children"].append({
+                        "type": "more",
+                        "count": len(hidden),
+                        "files": sum(child.files if child.is_dir else 1 for child in hidden),
+                    })
+            return entry
+
+        return build(node)
+
+    def to_mermaid(self, path="", max_depth=FILE_TREE_MAX_DEPTH, max_children=FILE_TREE_MAX_CHILDREN, max_nodes=FILE_TREE_MAX_NODES):
+        """Mermaid graph of the subtree at path, with generated node ids and quoted labels"""
+        root = self.node(path)
+        if root is None:
+            return None
+        expanded = self._expanded(root, max_depth, max_children, max_nodes)
+
+        lines = ["graph TD;"]
+        ids = {}
+
+        def add_node(key, label):
+            ids[key] = f"n{len(ids)}"
+            safe = label.replace('"', "#quot;")
+            lines.append(f'    {ids[key]}["{safe}"]')
+            return ids[key]
+
+        def visit(node):
+            node_id = ids[node.path]
+            shown, hidden = self._visible_children(node, max_children)
+            for child in shown:
+                if not child.is_dir:
+                    child_id = add_node(child.path, child.name)
+                elif child.path in expanded:
+                    child_id = add_node(child.path, f"{child.name}/")
+                else:
+                    child_id = add_node(child.path, f"{child.name}/ ({child.files} files)")
+                lines.append(f"    {node_id}-->{child_id}")
+                if child.path in expanded:
+                    visit(child)
+            if hidden:
+                files = sum(child.files if child.is_dir else 1 for child in hidden)
+                more_id = add_node(f"{node.path}/...more", f"{len(hidden)} more entries ({files} files)")
+                lines.append(f"    {node_id}-->{more_id}")
+
+        add_node(root.path, f"{root.path}/" if root.path else "/")
+        if root.path in expanded:
+            visit(root)
+        return "\n".join(lines) + "\n"
+
+
+def remember_file_tree(namespace, paths):
+    """Index a repository's file list and keep it for later subtree requests"""
+    tree = FileTree(paths)
+    file_tree_cache.set(namespace, json.dumps(list(paths)).encode("utf-8"))
+    with _trees_lock:
+        _trees[namespace] = tree
+        _trees.move_to_end(namespace)
+        while len(_trees) > FILE_TREE_MEMORY_ENTRIES:
+            _trees.popitem(last=False)
+    return tree
+
+
+def get_file_tree(namespace):
+    """The file tree last remembered for a repository, or None if it was never indexed"""
+    with _trees_lock:
+        tree = _trees.get(namespace)
+        if tree is not None:
+            _trees.move_to_end(namespace)
+            return tree
+    stored = file_tree_cache.get(namespace)
+    if stored is None:
+        return None
+    tree = FileTree(json.loads(stored))
+    with _trees_lock:
+        _trees[namespace] = tree
+        while len(_trees) > FILE_TREE_MEMORY_ENTRIES:
+            _trees.popitem(last=False)
+    return tree
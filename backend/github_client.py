@@ -0,0 +1,78 @@
+"""
+Shared async HTTP client for the GitHub API
+"""
+import os
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Diffs are read up to this many bytes; the rest of the response is never downloaded
+GITHUB_DIFF_MAX_BYTES = int(os.getenv("GITHUB_DIFF_MAX_BYTES", str(2 * 1024 * 1024)))
+GITHUB_MAX_CONNECTIONS = int(os.getenv("GITHUB_MAX_CONNECTIONS", "10"))
+
+_http_client = None
+
+
+class GithubError(Exception):
+    """Raised when GitHub cannot be reached or answers with an error"""
+
+
+def get_http_client():
+    """Return the pooled client shared by every GitHub request, creating it on first use"""
+    global _http_client
+    if _http_client is None:
+        import httpx
+
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=GITHUB_MAX_CONNECTIONS, max_keepalive_connections=GITHUB_MAX_CONNECTIONS),
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            follow_redirects=True,
+        )
+    return _http_client
+
+
+async def close_github_client():
+    """Close the shared GitHub connection pool, if it was ever opened"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def commit_diff_url(github_url, commit_hash):
+    """API URL of a commit's diff for github.com repositories, the web URL for other hosts"""
+    parsed = urlparse(github_url)
+    parts = parsed.path.strip("/").split("/")
+    if parsed.hostname in ("github.com", "www.github.com") and len(parts) >= 2:
+        owner, repo = parts[0], parts[1].removesuffix(".git")
+        return f"https://api.github.com/repos/{owner}/{repo}/commits/{commit_hash}"
+    return f"{github_url.rstrip('/')}/commit/{commit_hash}.diff"
+
+
+async def fetch_commit_diff(github_url, commit_hash, max_bytes=GITHUB_DIFF_MAX_BYTES):
+    """Download a commit's unified diff as text, reading at most max_bytes of it.
+
+    Raises GithubError if GitHub cannot be reached or answers with an error.
+    """
+    import httpx
+
+    headers = {"Accept": "application/vnd.github.v3.diff"}
+    token = os.getenv("GITHUB_PERSONAL_ACCESS_TOKEN")
+    if token:
+        headers["Authorization"] = f"token {token}"
+
+    chunks = []
+    size = 0
+    try:
+        async with get_http_client().stream("GET", commit_diff_url(github_url, commit_hash), headers=headers) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk[: max_bytes - size])
+                size += len(chunks[-1])
+                if size >= max_bytes:
+                    print(f"Diff of {commit_hash} is larger than {max_bytes} bytes, reading only the start")
+                    break
+    except httpx.HTTPError as e:
+        raise GithubError(f"Could not fetch commit {commit_hash} of {github_url}: {e}") from e
+    return b"".join(chunks).decode("utf-8", errors="replace")
@@ -0,0 +1,50 @@
+"""
+Records the commit each repository was last indexed at, per vector store.
+
+Keyed by store as well as namespace, so a repository indexed into the local
+fallback while Weaviate was down is indexed again once Weaviate is back.
+"""
+import os
+import time
+import sqlite3
+import threading
+from disk_cache import CACHE_DIR
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _connection():
+    global _conn
+    if _conn is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        _conn = sqlite3.connect(os.path.join(CACHE_DIR, "index_state.sqlite3"), check_same_thread=False, isolation_level=None)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS store_indexed_commits (namespace TEXT NOT NULL, store TEXT NOT NULL, "
+            "commit_sha TEXT NOT NULL, indexed_at REAL NOT NULL, PRIMARY KEY (namespace, store))"
+        )
+    return _conn
+
+
+def get_indexed_commit(namespace, store):
+    """Return the commit SHA the namespace was last fully indexed at in the store with this store_id, or None"""
+    with _lock:
+        row = _connection().execute(
+            "SELECT commit_sha FROM store_indexed_commits WHERE namespace = ? AND store = ?", (namespace, store)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def set_indexed_commit(namespace, store, commit_sha):
+    """Record that the namespace now reflects commit_sha in the store with this store_id"""
+    with _lock:
+        _connection().execute(
+            "INSERT OR REPLACE INTO store_indexed_commits (namespace, store, commit_sha, indexed_at) VALUES (?, ?, ?, ?)",
+            (namespace, store, commit_sha, time.time()),
+        )
+
+
+def forget_store(store):
+    """Drop every commit recorded for a store whose contents were wiped"""
+    with _lock:
+        _connection().execute("DELETE FROM store_indexed_commits WHERE store = ?", (store,))
@@ -0,0 +1,124 @@
+"""
+Batched, concurrent ingestion of objects into a vector store
+"""
+import time
+import asyncio
+from collections import deque
+
+# Stats of the most recent ingestion runs, newest last
+recent_runs = deque(maxlen=20)
+
+
+class BatchWriter:
+    """Consumes objects from a bounded queue and writes them to a vector store in batches.
+
+    With dynamic sizing the batch size doubles while flushes finish well within
+    target_latency seconds and halves when they take longer. Objects the store
+    rejects are recorded in failures without dropping the rest of their batch.
+    on_flush, if given, is called with the written and failed counts of every batch.
+    Use as an async context manager and feed it with put().
+    """
+
+    def __init__(self, store, namespace, batch_size=100, dynamic=True, min_batch_size=10,
+                 max_batch_size=1000, target_latency=1.0, linger=0.2, max_queue=2000, on_flush=None):
+        self.store = store
+        self.namespace = namespace
+        self.batch_size = batch_size
+        self.dynamic = dynamic
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_latency = target_latency
+        self.linger = linger
+        self.on_flush = on_flush
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.written = 0
+        self.failures = []
+        self.batches = 0
+        self.flush_seconds = 0.0
+        self._started = None
+        self._finished = None
+        self._task = None
+
+    async def __aenter__(self):
+        self._started = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.queue.put(None)
+            await self._task
+        else:
+            self._task.cancel()
+        self._finished = time.monotonic()
+        recent_runs.append(self.stats())
+
+    async def put(self, obj):
+        """Queue one {"properties": ..., "vector": ...} object, waiting if the queue is full"""
+        await self.queue.put(obj)
+
+    async def _next_batch(self):
+        """Collect up to batch_size objects; returns (batch, closed)"""
+        first = await self.queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                obj = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    obj = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if obj is None:
+                return batch, True
+            batch.append(obj)
+        return batch, False
+
+    async def _run(self):
+        closed = False
+        while not closed:
+            batch, closed = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch):
+        started = time.monotonic()
+        try:
+            failed = await asyncio.to_thread(self.store.insert_many, self.namespace, batch)
+        except Exception as e:
+            failed = [(i, str(e)) for i in range(len(batch))]
+        elapsed = time.monotonic() - started
+
+        for position, error in failed:
+            self.failures.append({"properties": batch[position]["properties"], "error": error})
+        self.written += len(batch) - len(failed)
+        self.batches += 1
+        self.flush_seconds += elapsed
+        if self.on_flush is not None:
+            self.on_flush(len(batch) - len(failed), len(failed))
+
+        if self.dynamic:
+            if elapsed > self.target_latency:
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            elif elapsed < self.target_latency / 2 and len(batch) == self.batch_size:
+                self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+
+    def stats(self):
+        """Throughput and failure counts for this writer"""
+        elapsed = ((self._finished or time.monotonic()) - self._started) if self._started else 0.0
+        return {
+            "namespace": self.namespace,
+            "written": self.written,
+            "failed": len(self.failures),
+            "batches": self.batches,
+            "batch_size": self.batch_size,
+            "elapsed_seconds": round(elapsed, 3),
+            "flush_seconds": round(self.flush_seconds, 3),
+            "objects_per_second": round(self.written / elapsed, 1) if elapsed else 0.0,
+        }
@@ -0,0 +1,98 @@
+"""
+Background jobs for long-running work such as repository indexing
+"""
+import os
+import time
+import uuid
+import asyncio
+
+# Finished jobs are forgotten after this many seconds
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 60 * 60)))
+
+
+class Job:
+    def __init__(self, kind, progress):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.progress = progress
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+
+    @property
+    def finished(self):
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Runs submitted coroutines as background tasks, at most max_workers at a time.
+
+    Kinds listed in kind_workers get their own limit instead of sharing max_workers,
+    so jobs that mostly wait, such as transcriptions, do not hold up indexing.
+    """
+
+    def __init__(self, max_workers, kind_workers=None):
+        self.max_workers = max_workers
+        self.kind_workers = kind_workers or {}
+        self._jobs = {}
+        self._slots = {}
+
+    def submit(self, kind, func, *args, progress=None):
+        """Start func(job, *args) in the background and return its Job immediately"""
+        self._prune()
+        pool = kind if kind in self.kind_workers else None
+        if pool not in self._slots:
+            self._slots[pool] = asyncio.Semaphore(self.kind_workers.get(pool, self.max_workers))
+        job = Job(kind, progress if progress is not None else {})
+        job.task = asyncio.create_task(self._run(job, func, args, self._slots[pool]))
+        self._jobs[job.id] = job
+        return job
+
+    async def _run(self, job, func, args, slots):
+        try:
+            async with slots:
+                job.status = "running"
+                job.started_at = time.time()
+                job.result = await func(job, *args)
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        """Return the job with this id, or None"""
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns False if it does not exist or already finished"""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.task.cancel()
+        return True
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
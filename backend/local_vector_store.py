@@ -0,0 +1,225 @@
+"""
+Embedded vector store used when Weaviate is not available.
+
+Each namespace is a unit-normalised float32 matrix memory-mapped from disk plus
+a JSON-lines file of object properties. Large namespaces are searched through
+a k-means (IVF) index.
+"""
+import os
+import re
+import json
+import uuid
+import hashlib
+import threading
+import numpy as np
+from vector_store import Hit, VECTOR_STORE_DIR, _matches, _select
+
+# Namespaces with at least this many vectors are searched through a clustered (IVF) index
+LOCAL_CLUSTER_MIN_VECTORS = int(os.getenv("LOCAL_CLUSTER_MIN_VECTORS", "20000"))
+LOCAL_CLUSTER_PROBES = int(os.getenv("LOCAL_CLUSTER_PROBES", "8"))
+
+
+class _LocalNamespace:
+    """Unit-normalised float32 matrix for one namespace, memory-mapped from disk, plus its properties"""
+
+    def __init__(self, path):
+        self.path = path
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.meta_path = os.path.join(path, "objects.jsonl")
+        self.ids = []
+        self.properties = []
+        self.dim = None
+        self._matrix = None
+        self._clusters = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                for line in f:
+                    record = json.loads(line)
+                    self.ids.append(record["id"])
+                    self.properties.append(record["properties"])
+            if self.ids:
+                self.dim = os.path.getsize(self.vectors_path) // (4 * len(self.ids))
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            if not self.ids:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.ids), self.dim))
+        return self._matrix
+
+    def _invalidate(self):
+        self._matrix = None
+        self._clusters = None
+
+    def append(self, vectors, properties):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dim is not None and vectors.shape[1] != self.dim:
+            raise ValueError(f"expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        ids = [str(uuid.uuid4()) for _ in properties]
+
+        os.makedirs(self.path, exist_ok=True)
+        self._invalidate()
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self.meta_path, "a") as f:
+            for object_id, props in zip(ids, properties):
+                f.write(json.dumps({"id": object_id, "properties": props}) + "\n")
+        self.dim = vectors.shape[1]
+        self.ids.extend(ids)
+        self.properties.extend(properties)
+
+    def remove(self, keep):
+        """Rewrite the namespace keeping only the rows whose index is in keep"""
+        matrix = np.array(self.matrix[keep]) if keep else np.zeros((0, self.dim or 0), dtype=np.float32)
+        ids = [self.ids[i] for i in keep]
+        properties = [self.properties[i] for i in keep]
+        self._invalidate()
+        with open(self.vectors_path + ".tmp", "wb") as f:
+            f.write(matrix.tobytes())
+        with open(self.meta_path + ".tmp", "w") as f:
+            for object_id, props in zip(ids, properties):
+                f.write(json.dumps({"id": object_id, "properties": props}) + "\n")
+        os.replace(self.vectors_path + ".tmp", self.vectors_path)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+        self.ids = ids
+        self.properties = properties
+
+    def _build_clusters(self):
+        """Cluster the rows with a few rounds of spherical k-means for inverted-file search"""
+        matrix = np.asarray(self.matrix)
+        n_clusters = int(np.sqrt(len(matrix)))
+        rng = np.random.default_rng(0)
+        centroids = matrix[rng.choice(len(matrix), n_clusters, replace=False)]
+        for _ in range(5):
+            assignment = np.argmax(matrix @ centroids.T, axis=1)
+            for c in range(n_clusters):
+                members = matrix[assignment == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1)
+        assignment = np.argmax(matrix @ centroids.T, axis=1)
+        self._clusters = (centroids, [np.flatnonzero(assignment == c) for c in range(n_clusters)])
+
+    def candidates(self):
+        """Row indices worth scoring, or None to score every row"""
+        if len(self.ids) < LOCAL_CLUSTER_MIN_VECTORS:
+            return None
+        if self._clusters is None:
+            self._build_clusters()
+        return self._clusters
+
+    def search(self, vector, limit, allowed=None):
+        """Return (row, distance) pairs for the nearest rows, optionally restricted to allowed rows"""
+        if not self.ids:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+
+        rows = None
+        clusters = self.candidates() if allowed is None else None
+        if clusters is not None:
+            centroids, members = clusters
+            probes = np.argsort(-(centroids @ query))[:LOCAL_CLUSTER_PROBES]
+            rows = np.concatenate([members[c] for c in probes])
+        elif allowed is not None:
+            rows = np.asarray(allowed, dtype=np.int64)
+        if rows is not None and not len(rows):
+            return []
+
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        distances = 1.0 - matrix @ query
+        top = min(limit, len(distances))
+        best = np.argpartition(distances, top - 1)[:top]
+        best = best[np.argsort(distances[best])]
+        if rows is not None:
+            return [(int(rows[i]), float(distances[i])) for i in best]
+        return [(int(i), float(distances[i])) for i in best]
+
+    def search_many(self, vectors, limit):
+        """Run search for several query vectors, scoring them against the matrix in one product"""
+        if not self.ids:
+            return [[] for _ in vectors]
+        if self.candidates() is not None:
+            return [self.search(vector, limit) for vector in vectors]
+        queries = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        distances = 1.0 - self.matrix @ (queries / norms).T
+        top = min(limit, len(distances))
+        results = []
+        for column in distances.T:
+            best = np.argpartition(column, top - 1)[:top]
+            best = best[np.argsort(column[best])]
+            results.append([(int(i), float(column[i])) for i in best])
+        return results
+
+
+class LocalVectorStore:
+    """In-process vector store keeping one memory-mapped float32 matrix per namespace on disk"""
+
+    def __init__(self, name, root=VECTOR_STORE_DIR):
+        self.root = os.path.join(root, name)
+        self.store_id = f"local:{os.path.abspath(self.root)}"
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace):
+        if namespace not in self._namespaces:
+            digest = hashlib.sha1(namespace.encode("utf-8")).hexdigest()[:12]
+            dirname = re.sub(r"[^A-Za-z0-9_.-]", "_", namespace)[-80:] + "-" + digest
+            self._namespaces[namespace] = _LocalNamespace(os.path.join(self.root, dirname))
+        return self._namespaces[namespace]
+
+    def insert_many(self, namespace, objects):
+        """Append objects to the namespace; returns a list of (position, error message) for failed objects"""
+        if not objects:
+            return []
+        with self._lock:
+            try:
+                self._namespace(namespace).append(
+                    [obj["vector"] for obj in objects],
+                    [{**obj["properties"], "namespace": namespace} for obj in objects],
+                )
+            except Exception as e:
+                return [(i, str(e)) for i in range(len(objects))]
+        return []
+
+    def query(self, namespace, vector, limit, max_distance=None, return_properties=None, where=None):
+        """Return up to limit hits closest to vector, nearest first"""
+        with self._lock:
+            ns = self._namespace(namespace)
+            allowed = None
+            if where:
+                allowed = [i for i, props in enumerate(ns.properties) if _matches(props, where)]
+            results = ns.search(vector, limit, allowed)
+            return [
+                Hit(ns.ids[row], _select(ns.properties[row], return_properties), distance)
+                for row, distance in results
+                if max_distance is None or distance <= max_distance
+            ]
+
+    def query_many(self, namespace, vectors, limit, max_distance=None, return_properties=None):
+        """Run query for several vectors at once; returns one list of hits per vector"""
+        with self._lock:
+            ns = self._namespace(namespace)
+            return [
+                [
+                    Hit(ns.ids[row], _select(ns.properties[row], return_properties), distance)
+                    for row, distance in results
+                    if max_distance is None or distance <= max_distance
+                ]
+                for results in ns.search_many(vectors, limit)
+            ]
+
+    def delete(self, namespace, where=None):
+        """Delete the objects of a namespace matching where; returns how many were deleted"""
+        with self._lock:
+            ns = self._namespace(namespace)
+            keep = [i for i, props in enumerate(ns.properties) if where and not _matches(props, where)]
+            deleted = len(ns.ids) - len(keep)
+            if deleted:
+                ns.remove(keep)
+            return deleted
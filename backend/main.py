@@ -1,56 +1,66 @@
 from dotenv import load_dotenv
 import os
+import json
 import asyncio
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from GithubLoader import GithubLoader
 import hashlib
-from _openai import getSummary, ask, summarise_commit
-from openai_utils import get_embeddings
+import hmac
+from _openai import ask, ask_stream, summarise_commit_by_hash, answer_with_context, retrieve_contexts, answer_cache
+from github_client import GithubError, close_github_client
+from doc_questions import load_sections, question_vectors, render_documentation
+from openai_utils import close_openai_client, embedding_cache, scheduler
+from rate_limiter import LLMUnavailableError
 from assembly import transcribe_file, ask_meeting
-import weaviate
+from transcription import notify_transcript, close_transcription_service, TRANSCRIPTION_WEBHOOK_HEADER, TRANSCRIPTION_WEBHOOK_SECRET
+from vector_store import get_vector_store, VectorStoreUnavailableError
+from weaviate_client import weaviate_connection
+from ingestion import recent_runs
+from pipeline import index_documents, new_progress
+from index_state import get_indexed_commit, set_indexed_commit
+from jobs import JobManager
+from file_tree import remember_file_tree, get_file_tree, FILE_TREE_MAX_DEPTH, FILE_TREE_MAX_CHILDREN
 
 load_dotenv()
 
-# Initialize Weaviate client for local instance
-try:
-    client = weaviate.WeaviateClient(
-        connection_params=weaviate.connect.ConnectionParams.from_url(
-            url="http://localhost:8080",
-            grpc_port=50051
-        )
-    )
-    
-    # Connect to Weaviate
-    client.connect()
-    
-    # Check if collection exists, if not create it
-    try:
-        index = client.collections.get("chatpdf")
-        print("✅ Connected to Weaviate successfully")
-    except Exception as e:
-        print(f"⚠️ Collection 'chatpdf' not found, creating it...")
-        # Create the collection
-        client.collections.create(
-            name="chatpdf",
-            properties=[
-                {"name": "source", "dataType": ["text"]},
-                {"name": "code", "dataType": ["text"]},
-                {"name": "summary", "dataType": ["text"]}
-            ],
-            vectorizer_config=weaviate.config.Configure.Vectorizer.none()
-        )
-        index = client.collections.get("chatpdf")
-        print("✅ Created and connected to Weaviate collection")
-        
-except Exception as e:
-    print(f"⚠️ Warning: Could not connect to Weaviate: {e}")
-    print("💡 Make sure Weaviate is running with: docker-compose -f weaviate-docker-compose.yml up")
-    index = None
+
+# Repositories indexed in the background at the same time; transcriptions mostly wait, so they get their own limit
+job_manager = JobManager(
+    max_workers=int(os.getenv("INDEXING_WORKERS", "2")),
+    kind_workers={"transcription": int(os.getenv("TRANSCRIPTION_WORKERS", "20"))},
+)
+
+# Commits summarised at the same time by one /summarise-commits request
+COMMIT_SUMMARY_CONCURRENCY = int(os.getenv("COMMIT_SUMMARY_CONCURRENCY", "8"))
 
 app = FastAPI()
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_openai_client()
+    await close_github_client()
+    await close_transcription_service()
+    await asyncio.to_thread(weaviate_connection.close)
+
+
+@app.exception_handler(LLMUnavailableError)
+async def llm_unavailable(request: Request, exc: LLMUnavailableError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+@app.exception_handler(VectorStoreUnavailableError)
+async def vector_store_unavailable(request: Request, exc: VectorStoreUnavailableError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+@app.exception_handler(GithubError)
+async def github_unavailable(request: Request, exc: GithubError):
+    return JSONResponse(status_code=502, content={"detail": str(exc)})
+
+
 class GenerateDocumentationRequest(BaseModel):
     github_url: str
 
@@ -64,139 +74,241 @@ def serialise_github_url(url):
     return url.replace("/", "_")
 
 
-def generate_file_tree_graph(file_tree):
-    graph = "graph TD;\n"
+async def index_repository(github_url, progress=None):
+    """Clone a repository and stream its changed files through the indexing pipeline.
+
+    Returns the Mermaid file-tree graph and the pipeline progress counters.
+    """
+    namespace = serialise_github_url(github_url)
+    progress = progress if progress is not None else new_progress()
+    github_loader = GithubLoader()
+    try:
+        progress["stage"] = "cloning"
+        await asyncio.to_thread(github_loader.load, github_url)
+        head_commit = github_loader.head_commit
+        file_tree = await asyncio.to_thread(github_loader.list_files)
+        tree = await asyncio.to_thread(remember_file_tree, namespace, file_tree)
+        mermaid_graph = tree.to_mermaid()
+        print(f"mermaid graph of {len(file_tree)} files in {mermaid_graph.count(chr(10))} lines")
+
+        store = await asyncio.to_thread(get_vector_store, "chatpdf")
+        if store is None:
+            print("⚠️ Warning: Weaviate not connected, skipping data insertion")
+            return mermaid_graph, progress
+
+        # Only re-process the files that changed since the commit the repo was last indexed at
+        previous_commit = get_indexed_commit(namespace, store.store_id)
+        changes = await asyncio.to_thread(github_loader.changed_paths, previous_commit) if previous_commit else None
+        if changes is None:
+            print(f"Fully indexing {namespace} at {head_commit}")
+            await asyncio.to_thread(store.delete, namespace)
+            paths = file_tree
+        else:
+            print(
+                f"Incrementally indexing {namespace} from {previous_commit} to {head_commit}: "
+                f"{len(changes['added'])} added, {len(changes['modified'])} modified, {len(changes['deleted'])} deleted"
+            )
+            # Added paths too: a previous run may have written some of their chunks before failing
+            stale = changes["added"] + changes["modified"] + changes["deleted"]
+            if stale:
+                await asyncio.to_thread(store.delete, namespace, {"source": stale})
+            paths = changes["added"] + changes["modified"]
+
+        # Cached answers describe the repository as it was before this run
+        if changes is None or any(changes.values()):
+            answer_cache.invalidate(namespace)
+
+        progress["stage"] = "indexing"
+        await index_documents(github_loader.iter_documents(paths), store, namespace, progress)
+    finally:
+        github_loader.cleanup()
+
+    # Leave the recorded commit alone if anything failed so the next run retries those files
+    if progress["failed"]:
+        print(f"Warning: {progress['failed']} files failed to index and will be retried next run")
+    else:
+        set_indexed_commit(namespace, store.store_id, head_commit)
+    return mermaid_graph, progress
+
+
+async def start_documentation(github_url, progress):
+    """Index a repository and start answering the onboarding questions about it.
+
+    Returns (mermaid_graph, sections, answers), where answers holds one task per
+    section in section order, or an error dict.
+    """
+    namespace = serialise_github_url(github_url)
+    mermaid_graph, progress = await index_repository(github_url, progress)
+    if progress["loaded"] and not progress["inserted"]:
+        print("Warning: no documents were indexed")
+        return {"error": "Failed to generate embeddings for the documents"}
+
+    sections = load_sections()
+    progress["stage"] = "answering"
+    progress["answered"] = 0
+    store = await asyncio.to_thread(get_vector_store, "chatpdf")
+    if store is None:
+        return {"error": "Vector store is unavailable"}
+    vectors = await question_vectors(sections)
+    contexts = await retrieve_contexts(store, namespace, [section["question"] for section in sections], vectors)
+
+    async def answer(question, context):
+        result = await answer_with_context(question, context)
+        progress["answered"] += 1
+        return result
+
+    answers = [
+        asyncio.create_task(answer(section["question"], context))
+        for section, context in zip(sections, contexts)
+    ]
+    return mermaid_graph, sections, answers
 
-    for item in file_tree:
-        if "/" in item:
-            parent_dir, current_dir = item.rsplit("/", 1)
-            graph += f"    {parent_dir}-->{current_dir}\n"
 
-    return graph
+async def build_documentation(github_url, progress=None):
+    """Index a repository and answer the onboarding questions about it"""
+    progress = progress if progress is not None else new_progress()
+    started = await start_documentation(github_url, progress)
+    if isinstance(started, dict):
+        return started
+    mermaid_graph, sections, tasks = started
+    try:
+        answers = await asyncio.gather(*tasks)
+    finally:
+        # Stop the remaining questions if one of them failed
+        for task in tasks:
+            task.cancel()
+
+    projectName = github_url.split("/")[-1]
+    documentation = render_documentation(projectName, sections, answers)
+
+    progress["stage"] = "done"
+    return {"documentation": documentation, "mermaid": mermaid_graph}
+
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
 
 @app.post("/generate_documentation")
 async def generate_documentation(body: GenerateDocumentationRequest):
-    github_loader = GithubLoader()
-    loader = github_loader.load(body.github_url)
-    raw_documents = loader.load()
-    file_tree = [i.metadata["source"] for i in raw_documents]
-    mermaid_graph = generate_file_tree_graph(file_tree)
-
-    print("mermaid", mermaid_graph)
-    summaries = await asyncio.gather(
-        *[getSummary(doc.metadata["source"], doc.page_content) for doc in raw_documents]
-    )
-    # print(summaries)
-    for i, doc in enumerate(raw_documents):
-        doc.metadata["summary"] = summaries[i]
-
-    embeddings = await asyncio.gather(
-        *[get_embeddings(doc.metadata["summary"]) for doc in raw_documents]
-    )
-    print("got summary")
-    
-    # Check if any embeddings failed
-    if any(emb is None for emb in embeddings):
-        print("Warning: Some embeddings failed, skipping Weaviate insertion")
-        return {"error": "Failed to generate embeddings for some documents"}
-    
-    for i, doc in enumerate(raw_documents):
-        doc.metadata["embedding"] = embeddings[i]
-    print("got embeddings")
-
-    # Prepare data for upsert
-    objects_to_upsert = []
-    for doc in raw_documents:
-        objects_to_upsert.append({
-            "properties": {
-                "source": doc.metadata["source"],
-                "code": doc.page_content[:10000],
-                "summary": doc.metadata["summary"]
-            },
-            "vector": doc.metadata["embedding"]
-        })
-    
-    # Upsert the objects using the correct method
-    if index is None:
-        print("⚠️ Warning: Weaviate not connected, skipping data insertion")
-    else:
+    return await build_documentation(body.github_url)
+
+
+@app.post("/generate_documentation/stream")
+async def generate_documentation_stream(body: GenerateDocumentationRequest):
+    """Stream documentation as server-sent events: stage updates, the file tree,
+    then one "section" event per question as soon as it is answered, and "done"."""
+
+    async def events():
+        progress = new_progress()
+        yield sse_event("stage", {"stage": "cloning"})
+        answers = []
         try:
-            # Insert objects one by one to avoid batch issues
-            for obj in objects_to_upsert:
-                try:
-                    index.data.insert(obj)
-                except Exception as insert_error:
-                    print(f"Error inserting individual object: {insert_error}")
+            started = await start_documentation(body.github_url, progress)
+            if isinstance(started, dict):
+                yield sse_event("error", {"detail": started["error"]})
+                return
+            mermaid_graph, sections, answers = started
+            yield sse_event("mermaid", {"mermaid": mermaid_graph})
+            yield sse_event("stage", {"stage": "answering", "sections": [section["id"] for section in sections]})
+
+            pending = set(answers)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    section = sections[answers.index(task)]
+                    yield sse_event("section", {**section, "answer": task.result()})
+
+            documentation = render_documentation(
+                body.github_url.split("/")[-1], sections, [task.result() for task in answers]
+            )
+            yield sse_event("done", {"documentation": documentation, "mermaid": mermaid_graph})
+        except LLMUnavailableError as e:
+            yield sse_event("error", {"detail": str(e)})
         except Exception as e:
-            print(f"Error inserting data into Weaviate: {e}")
-    questions = [
-        "What is the project about?",
-        "How can I get started with this project?",
-        "What does the project's repository contain?",
-        "Are there any coding standards or guidelines I should follow?",
-        "What dependencies, packages, APIs, or libraries does the project use? Look into the package.json file.",
-        "How can I build and compile the project?",
-        "What should I know about testing in this project?",
-        "How can I contribute to the project?",
-        "How are issues tracked in this project?",
-        "What's the version control strategy for this project?",
-        "Tell me about the project's CI/CD pipeline.",
-        "Where should I add documentation and comments in the codebase?",
-    ]
-    answers = await asyncio.gather(
-        *[
-            ask(question, serialise_github_url(body.github_url))
-            for question in questions
-        ]
-    )
-    # documentation = {}
-    # for i, question in enumerate(questions):
-    #     documentation[question] = answers[i]
-    documentation = []
-    for i, question in enumerate(questions):
-        documentation.append({"question": question, "answer": answers[i]})
-
-    projectName = body.github_url.split("/")[-1]
-    documentation = f"""<h1>{projectName}</h1>
-  <ul>
-  <li><a href="#introduction">Introduction</a></li>
-  <li><a href="#getting-started">Getting Started</a></li>
-  <li><a href="#repository">Repository</a></li>
-  <li><a href="#coding-standards">Coding Standards</a></li>
-  <li><a href="#dependencies">Dependencies</a></li>
-  <li><a href="#building-and-compiling">Building and Compiling</a></li>
-  <li><a href="#testing">Testing</a></li>
-  <li><a href="#contributing">Contributing</a></li>
-  <li><a href="#issues">Issues</a></li>
-  <li><a href="#version-control">Version Control</a></li>
-  <li><a href="#ci-cd">CI/CD</a></li>
-  </ul>
-
-  <h2 id="introduction">Introduction</h2>
-  <pre>{documentation[0]['answer']}</pre>
-  <h2 id="getting-started">Getting Started</h2>
-  <pre>{documentation[1]['answer']}</pre>
-  <h2 id="repository">Repository</h2>
-  <pre>{documentation[2]['answer']}</pre>
-  <h2 id="coding-standards">Coding Standards</h2>
-  <pre>{documentation[3]['answer']}</pre>
-  <h2 id="dependencies">Dependencies</h2>
-  <pre>{documentation[4]['answer']}</pre>
-  <h2 id="building-and-compiling">Building and Compiling</h2>
-  <pre>{documentation[5]['answer']}</pre>
-  <h2 id="testing">Testing</h2>
-  <pre>{documentation[6]['answer']}</pre>
-  <h2 id="contributing">Contributing</h2>
-  <pre>{documentation[7]['answer']}</pre>
-  <h2 id="issues">Issues</h2>
-  <pre>{documentation[8]['answer']}</pre>
-  <h2 id="version-control">Version Control</h2>
-  <pre>{documentation[9]['answer']}</pre>
-  <h2 id="ci-cd">CI/CD</h2>
-  <pre>{documentation[10]['answer']}</pre>"""
+            # The response has already started, so the client can only learn about the failure as an event
+            print(f"❌ Documentation stream failed: {e}")
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            # Stop answering if the client went away or a question failed
+            for task in answers:
+                task.cancel()
 
-    return {"documentation": documentation, "mermaid": mermaid_graph}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def documentation_job(job, github_url):
+    result = await build_documentation(github_url, job.progress)
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return result
+
+
+@app.post("/jobs/documentation")
+async def submit_documentation_job(body: GenerateDocumentationRequest):
+    job = job_manager.submit("documentation", documentation_job, body.github_url, progress=new_progress())
+    return {"job_id": job.id, "status": job.status}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job.result
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=404, detail="No running job with that id")
+    return {"job_id": job_id, "status": "cancelling"}
+
+
+class FileTreeRequest(BaseModel):
+    github_url: str
+    path: str = ""
+    depth: int = FILE_TREE_MAX_DEPTH
+    max_children: int = FILE_TREE_MAX_CHILDREN
+
+
+@app.post("/file-tree")
+async def file_tree(body: FileTreeRequest):
+    """A directory of an indexed repository, a few levels deep, so the UI can expand the tree lazily"""
+    tree = await asyncio.to_thread(get_file_tree, serialise_github_url(body.github_url))
+    if tree is None:
+        raise HTTPException(status_code=404, detail="Repository has not been indexed")
+    depth = max(1, body.depth)
+    max_children = max(1, body.max_children)
+    subtree = tree.subtree(body.path, depth, max_children)
+    if subtree is None:
+        raise HTTPException(status_code=404, detail="Path not found in repository")
+    return {"tree": subtree, "mermaid": tree.to_mermaid(body.path, depth, max_children)}
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "ingestion": list(recent_runs),
+        "openai_scheduler": scheduler.stats(),
+        "weaviate": weaviate_connection.stats(),
+    }
 
 
 @app.post("/ask")
@@ -205,6 +317,26 @@ async def query(body: AskRequest):
     return {"message": response}
 
 
+@app.post("/ask/stream")
+async def query_stream(body: AskRequest):
+    """Stream the answer as server-sent "token" events, then a "done" event"""
+
+    async def events():
+        try:
+            async for text in ask_stream(body.query, serialise_github_url(body.github_url)):
+                yield sse_event("token", {"text": text})
+        except LLMUnavailableError as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        except Exception as e:
+            print(f"❌ Answer stream failed: {e}")
+            yield sse_event("error", {"detail": str(e)})
+            return
+        yield sse_event("done", {})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 class summariseCommitBody(BaseModel):
     commitHash: str
     github_url: str
@@ -212,29 +344,61 @@ class summariseCommitBody(BaseModel):
 
 @app.post("/summarise-commit")
 async def summariseCommits(body: summariseCommitBody):
-    import requests
-
-    response = requests.get(
-        f"{body.github_url}/commit/{body.commitHash}.diff",
-        headers={
-            "Accept": "application/vnd.github.v3.diff",
-            "Authorization": f"token {os.getenv('GITHUB_PERSONAL_ACCESS_TOKEN')}",
-        },
-    )
-    summary = await summarise_commit(str(response.content[:10000]))
+    summary = await summarise_commit_by_hash(body.github_url, body.commitHash)
     print("summary for commit", summary)
     return {"summary": summary}
 
 
+class summariseCommitsBatchBody(BaseModel):
+    commitHashes: list[str]
+    github_url: str
+
+
+@app.post("/summarise-commits")
+async def summariseCommitsBatch(body: summariseCommitsBatchBody):
+    """Summarise many commits concurrently; failures are reported per commit"""
+    slots = asyncio.Semaphore(COMMIT_SUMMARY_CONCURRENCY)
+
+    async def summarise(commit_hash):
+        async with slots:
+            try:
+                return {"commitHash": commit_hash, "summary": await summarise_commit_by_hash(body.github_url, commit_hash)}
+            except (GithubError, LLMUnavailableError) as e:
+                print(f"Could not summarise commit {commit_hash}: {e}")
+                return {"commitHash": commit_hash, "error": str(e)}
+
+    summaries = await asyncio.gather(*[summarise(commit_hash) for commit_hash in dict.fromkeys(body.commitHashes)])
+    return {"summaries": summaries}
+
+
 class transcribeMeetingBody(BaseModel):
     url: str
 
 
+async def transcription_job(job, url):
+    return {"summaries": await transcribe_file(url, job.progress)}
+
+
 @app.post("/transcribe-meeting")
 async def transcribeMeeting(body: transcribeMeetingBody):
+    """Start transcribing a meeting; poll /jobs/{job_id} and fetch the summaries from /jobs/{job_id}/result"""
     print("transcribing", body.url)
-    summaries = await transcribe_file(body.url)
-    return {"summaries": summaries}
+    job = job_manager.submit("transcription", transcription_job, body.url)
+    return {"job_id": job.id, "status": job.status}
+
+
+class transcriptionWebhookBody(BaseModel):
+    transcript_id: str
+    status: str
+
+
+@app.post("/transcription-webhook")
+async def transcriptionWebhook(body: transcriptionWebhookBody, request: Request):
+    """Called by the transcription service when a transcript finishes, so its job does not wait for the next poll"""
+    secret = request.headers.get(TRANSCRIPTION_WEBHOOK_HEADER, "")
+    if TRANSCRIPTION_WEBHOOK_SECRET and not hmac.compare_digest(secret, TRANSCRIPTION_WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+    return {"transcript_id": body.transcript_id, "notified": notify_transcript(body.transcript_id)}
 
 
 class askMeetingBody(BaseModel):
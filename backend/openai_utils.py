@@ -2,13 +2,78 @@
 Shared OpenAI utilities to eliminate redundancy between modules
 """
 import os
-import openai
+import asyncio
 from dotenv import load_dotenv
+from tokens import count_tokens, truncate_to_tokens
+from embedding_cache import EmbeddingCache, normalize_text
+from rate_limiter import RequestScheduler, LLMUnavailableError
 
 load_dotenv()
 
-# Initialize OpenAI client once for the entire application
-openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Maximum number of OpenAI requests allowed in flight at once across the process
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+
+_openai_client = None
+
+
+def get_openai_client():
+    """Return the OpenAI client shared by the entire application, creating it on first use.
+
+    openai and httpx are imported here rather than at module load to keep startup fast.
+    Retries are handled by the scheduler, so the client itself never retries.
+    """
+    global _openai_client
+    if _openai_client is None:
+        import httpx
+        import openai
+
+        # Shared, pooled HTTP connection for every OpenAI call made by the application
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONCURRENCY,
+                max_keepalive_connections=OPENAI_MAX_CONCURRENCY,
+            ),
+            timeout=httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT", "60")), connect=10.0),
+        )
+        _openai_client = openai.AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client, max_retries=0
+        )
+    return _openai_client
+
+# Shared rate budgets for every OpenAI request made by this process
+scheduler = RequestScheduler(
+    requests_per_minute=int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "3500")),
+    tokens_per_minute=int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "160000")),
+    max_concurrency=OPENAI_MAX_CONCURRENCY,
+    interactive_reserve=float(os.getenv("OPENAI_INTERACTIVE_RESERVE", "0.25")),
+)
+
+CHAT_MODEL = "gpt-3.5-turbo"
+EMBEDDING_MODEL = "text-embedding-ada-002"
+# Per-request limits of the embeddings endpoint
+EMBEDDING_INPUT_MAX_TOKENS = 8191
+EMBEDDING_BATCH_MAX_INPUTS = int(os.getenv("EMBEDDING_BATCH_MAX_INPUTS", "2048"))
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "300000"))
+# Completion tokens budgeted for a chat request before its actual usage is known
+CHAT_COMPLETION_TOKEN_ESTIMATE = 500
+
+embedding_cache = EmbeddingCache(
+    max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "20000")),
+    disk_max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+)
+
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage", None)
+    return usage.total_tokens if usage is not None else None
+
+
+async def close_openai_client():
+    """Close the shared OpenAI HTTP connection pool, if it was ever opened"""
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
 
 # Shared system prompt for AI assistant
 AI_ASSISTANT_SYSTEM_PROMPT = """
@@ -34,25 +99,138 @@ AI assistant will take into account any CONTEXT BLOCK that is provided in a conv
 If the context does not provide the answer to question, the AI assistant will say, "I'm sorry, but I don't know the answer to that question".
 """
 
-async def create_chat_completion(messages, model="gpt-3.5-turbo"):
-    """Create a chat completion with error handling"""
+async def create_chat_completion(messages, model=CHAT_MODEL, background=False):
+    """Create a chat completion; raises LLMUnavailableError if the request fails.
+
+    background marks work nobody is waiting on, such as indexing, which yields to interactive requests.
+    """
+    estimated_tokens = sum(count_tokens(message["content"], model) for message in messages) + CHAT_COMPLETION_TOKEN_ESTIMATE
     try:
-        response = openai_client.chat.completions.create(
-            model=model,
-            messages=messages
+        response = await scheduler.run(
+            lambda: get_openai_client().chat.completions.create(model=model, messages=messages),
+            estimated_tokens,
+            _usage_tokens,
+            background=background,
         )
-        return response.choices[0].message.content
-    except Exception as e:
+    except LLMUnavailableError as e:
         print(f"OpenAI API error: {e}")
-        return f"I'm sorry, but I'm unable to process your request at the moment due to API limitations. Please try again later."
+        raise
+    return response.choices[0].message.content
+
+
+async def stream_chat_completion(messages, model=CHAT_MODEL):
+    """Yield the text of a chat completion as it is generated; raises LLMUnavailableError if the request fails"""
+    estimated_tokens = sum(count_tokens(message["content"], model) for message in messages) + CHAT_COMPLETION_TOKEN_ESTIMATE
+    # Only opening the stream is retried; tokens already sent to the caller cannot be taken back.
+    # The stream keeps its scheduler slot, and so its pooled connection, until it is closed.
+    async with scheduler.stream(
+        lambda: get_openai_client().chat.completions.create(
+            model=model, messages=messages, stream=True, stream_options={"include_usage": True}
+        ),
+        estimated_tokens,
+    ) as stream:
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    scheduler.record_usage(estimated_tokens, chunk.usage.total_tokens)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            print(f"OpenAI API error while streaming: {e}")
+            raise LLMUnavailableError(f"OpenAI stream failed: {e}") from e
+        finally:
+            await stream.close()
+
+
+def _prepare_embedding_input(text):
+    """Normalise text before it is sent to the embeddings endpoint"""
+    return truncate_to_tokens(normalize_text(text), EMBEDDING_INPUT_MAX_TOKENS)
+
 
 async def get_embeddings(text):
-    """Get embeddings for text using OpenAI API"""
+    """Get embeddings for text using OpenAI API, served from the embedding cache when possible"""
+    text = _prepare_embedding_input(text)
+    cached = embedding_cache.get(EMBEDDING_MODEL, text)
+    if cached is not None:
+        return cached
     try:
-        response = openai_client.embeddings.create(
-            input=text.replace("\n", ""), model="text-embedding-ada-002"
+        response = await scheduler.run(
+            lambda: get_openai_client().embeddings.create(input=text, model=EMBEDDING_MODEL),
+            count_tokens(text),
+            _usage_tokens,
         )
-        return response.data[0].embedding
-    except Exception as e:
+    except LLMUnavailableError as e:
         print(f"OpenAI embeddings error: {e}")
-        return None 
\ No newline at end of file
+        return None
+    embedding = response.data[0].embedding
+    embedding_cache.set(EMBEDDING_MODEL, text, embedding)
+    return embedding
+
+
+def pack_embedding_batches(texts, max_inputs=EMBEDDING_BATCH_MAX_INPUTS, max_tokens=EMBEDDING_BATCH_MAX_TOKENS):
+    """Group the indices of texts into sub-batches that fit the embeddings request limits"""
+    batches = []
+    current = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if current and (len(current) >= max_inputs or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _embed_batch(inputs, model, background=False):
+    """Embed one sub-batch; returns None for every input if it fails for good"""
+    try:
+        response = await scheduler.run(
+            lambda: get_openai_client().embeddings.create(input=inputs, model=model),
+            sum(count_tokens(text) for text in inputs),
+            _usage_tokens,
+            background=background,
+        )
+    except LLMUnavailableError as e:
+        print(f"OpenAI batch embeddings error ({len(inputs)} inputs): {e}")
+        return [None] * len(inputs)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+async def get_embeddings_batch(texts, model=EMBEDDING_MODEL, background=False):
+    """Get embeddings for many texts, packing them into as few requests as possible.
+
+    Cached texts are answered locally and duplicate texts are only sent once.
+    The result has one entry per input text, in input order; entries whose
+    sub-batch failed (or whose text was empty) are None. background is passed
+    on to the scheduler as for create_chat_completion.
+    """
+    embeddings = [None] * len(texts)
+    missing = {}
+    for i, text in enumerate(texts):
+        text = _prepare_embedding_input(text)
+        if not text:
+            continue
+        cached = embedding_cache.get(model, text)
+        if cached is not None:
+            embeddings[i] = cached
+        else:
+            missing.setdefault(text, []).append(i)
+
+    inputs = list(missing)
+    batches = pack_embedding_batches(inputs)
+    results = await asyncio.gather(
+        *[_embed_batch([inputs[j] for j in batch], model, background) for batch in batches]
+    )
+
+    for batch, vectors in zip(batches, results):
+        for j, vector in zip(batch, vectors):
+            if vector is None:
+                continue
+            embedding_cache.set(model, inputs[j], vector)
+            for i in missing[inputs[j]]:
+                embeddings[i] = vector
+    return embeddings
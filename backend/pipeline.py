@@ -0,0 +1,129 @@
+"""
+Streaming indexing pipeline: load -> summarise -> embed -> insert, with the stages
+overlapping through bounded queues so memory stays flat regardless of repository size
+"""
+import os
+import time
+import asyncio
+from _openai import getSummary
+from openai_utils import get_embeddings_batch, CHAT_MODEL
+from tokens import truncate_to_tokens
+from ingestion import BatchWriter
+
+# Number of files summarised concurrently and the depth of each inter-stage queue
+SUMMARY_WORKERS = int(os.getenv("PIPELINE_SUMMARY_WORKERS", "32"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "256"))
+# Summaries are embedded in micro-batches of up to this many, waiting at most EMBED_LINGER seconds to fill one
+EMBED_BATCH_SIZE = int(os.getenv("PIPELINE_EMBED_BATCH_SIZE", "64"))
+EMBED_LINGER = 0.5
+# Code stored with each file is capped in tokens so retrieved context fits in a question's prompt
+STORED_CODE_MAX_TOKENS = int(os.getenv("STORED_CODE_MAX_TOKENS", "2500"))
+
+_DONE = object()
+
+
+def new_progress():
+    """Current stage and per-stage counters, updated while a pipeline runs"""
+    return {"stage": "queued", "loaded": 0, "summarized": 0, "embedded": 0, "inserted": 0, "failed": 0}
+
+
+async def _load(documents, loaded, progress):
+    """Pull documents from a blocking iterator on a worker thread and queue them"""
+    iterator = iter(documents)
+    while True:
+        doc = await asyncio.to_thread(next, iterator, None)
+        if doc is None:
+            break
+        progress["loaded"] += 1
+        await loaded.put(doc)
+    for _ in range(SUMMARY_WORKERS):
+        await loaded.put(_DONE)
+
+
+async def _summarise(loaded, summarised, progress):
+    while True:
+        doc = await loaded.get()
+        if doc is _DONE:
+            await summarised.put(_DONE)
+            return
+        try:
+            doc.metadata["summary"] = await getSummary(doc.metadata["source"], doc.page_content)
+        except Exception as e:
+            print(f"Warning: summary failed for {doc.metadata['source']}, skipping it: {e}")
+            progress["failed"] += 1
+            continue
+        progress["summarized"] += 1
+        await summarised.put(doc)
+
+
+async def _next_micro_batch(summarised, finished_workers):
+    """Collect up to EMBED_BATCH_SIZE summarised documents; returns (batch, finished_workers)"""
+    batch = []
+    deadline = None
+    while len(batch) < EMBED_BATCH_SIZE and finished_workers < SUMMARY_WORKERS:
+        timeout = None if deadline is None else deadline - time.monotonic()
+        if timeout is not None and timeout <= 0:
+            break
+        try:
+            doc = await asyncio.wait_for(summarised.get(), timeout)
+        except asyncio.TimeoutError:
+            break
+        if doc is _DONE:
+            finished_workers += 1
+            continue
+        batch.append(doc)
+        if deadline is None:
+            deadline = time.monotonic() + EMBED_LINGER
+    return batch, finished_workers
+
+
+async def _embed(summarised, writer, progress):
+    finished_workers = 0
+    while finished_workers < SUMMARY_WORKERS:
+        batch, finished_workers = await _next_micro_batch(summarised, finished_workers)
+        if not batch:
+            continue
+        embeddings = await get_embeddings_batch([doc.metadata["summary"] for doc in batch], background=True)
+        for doc, embedding in zip(batch, embeddings):
+            # Skip documents whose embeddings failed instead of dropping the whole repo
+            if embedding is None:
+                print(f"Warning: embedding failed for {doc.metadata['source']}, skipping it")
+                progress["failed"] += 1
+                continue
+            progress["embedded"] += 1
+            code = await asyncio.to_thread(truncate_to_tokens, doc.page_content, STORED_CODE_MAX_TOKENS, CHAT_MODEL)
+            await writer.put({
+                "properties": {
+                    "source": doc.metadata["source"],
+                    "code": code,
+                    "summary": doc.metadata["summary"]
+                },
+                "vector": embedding
+            })
+
+
+async def index_documents(documents, store, namespace, progress=None):
+    """Summarise, embed and insert documents as they are produced.
+
+    documents may be any (blocking) iterable of Document-like objects; it is
+    consumed lazily. Returns the final progress counters.
+    """
+    progress = progress if progress is not None else new_progress()
+    loaded = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    summarised = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    def on_flush(written, failed):
+        progress["inserted"] += written
+        progress["failed"] += failed
+
+    async with BatchWriter(store, namespace, on_flush=on_flush) as writer:
+        # A failing stage cancels the others instead of leaving them blocked on their queues
+        async with asyncio.TaskGroup() as stages:
+            stages.create_task(_load(documents, loaded, progress))
+            for _ in range(SUMMARY_WORKERS):
+                stages.create_task(_summarise(loaded, summarised, progress))
+            stages.create_task(_embed(summarised, writer, progress))
+    for failure in writer.failures:
+        print(f"Error inserting {failure['properties']['source']}: {failure['error']}")
+    print("ingestion stats", writer.stats())
+    return progress
@@ -0,0 +1,234 @@
+"""
+Process-wide scheduler for OpenAI requests.
+
+Every chat and embedding call goes through one RequestScheduler, which keeps the
+process within its requests-per-minute and tokens-per-minute budgets using token
+buckets, adapts its concurrency when the provider answers 429, honours
+retry-after headers and retries transient failures with jittered backoff.
+Background work (indexing, summaries) leaves a share of the slots and of the
+token budget to interactive requests, and waits while any of them is queued.
+"""
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class LLMUnavailableError(Exception):
+    """Raised when an OpenAI request cannot be completed, instead of returning placeholder text"""
+
+
+class TokenBucket:
+    """Continuously refilling budget of rate_per_minute units"""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self.tokens = float(rate_per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount units are available (0 if they are available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        """Take amount units; the balance may go negative when correcting an estimate"""
+        self._refill()
+        self.tokens -= amount
+
+
+def _retry_after(error):
+    """Seconds the provider asked us to wait, if it said so"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+def _is_retryable(error):
+    import openai
+
+    return isinstance(
+        error,
+        (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError),
+    )
+
+
+class RequestScheduler:
+    def __init__(self, requests_per_minute, tokens_per_minute, max_concurrency, max_attempts=6, interactive_reserve=0.25):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        # Share of the concurrency slots and token budget that background requests leave free
+        self.interactive_reserve = interactive_reserve
+        self.in_flight = 0
+        self.background_in_flight = 0
+        self.interactive_waiting = 0
+        self.paused_until = 0.0
+        self.rate_limited = 0
+        self.retries = 0
+        self.failures = 0
+        self._condition = None
+
+    def _get_condition(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def _acquire(self, estimated_tokens, background=False):
+        condition = self._get_condition()
+        async with condition:
+            if background:
+                reserved_tokens = self.tokens.capacity * self.interactive_reserve
+            else:
+                reserved_tokens = 0
+                self.interactive_waiting += 1
+            try:
+                while True:
+                    wait = max(
+                        self.paused_until - time.monotonic(),
+                        self.requests.wait_time(1),
+                        self.tokens.wait_time(estimated_tokens + reserved_tokens),
+                    )
+                    if background:
+                        # Always allow one background request, or indexing would stall once throttled down to one slot
+                        limit = max(1, self.concurrency - int(self.concurrency * self.interactive_reserve))
+                        ready = self.in_flight < limit and not self.interactive_waiting
+                    else:
+                        ready = self.in_flight < self.concurrency
+                    if ready and wait <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(condition.wait(), wait if wait > 0 else None)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                if not background:
+                    self.interactive_waiting -= 1
+                    condition.notify_all()
+            self.in_flight += 1
+            if background:
+                self.background_in_flight += 1
+            self.requests.consume(1)
+            self.tokens.consume(estimated_tokens)
+
+    async def _release(self, error=None, background=False):
+        import openai
+
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            if background:
+                self.background_in_flight -= 1
+            if isinstance(error, openai.RateLimitError):
+                # Multiplicative decrease on throttling, and pause everyone for as long as the provider asked
+                self.rate_limited += 1
+                self.concurrency = max(1, self.concurrency // 2)
+                retry_after = _retry_after(error)
+                if retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            elif error is None and self.concurrency < self.max_concurrency:
+                # Additive increase while requests succeed
+                self.concurrency += 1
+            condition.notify_all()
+
+    def _wait(self, retry_state):
+        from tenacity import wait_random_exponential
+
+        backoff = wait_random_exponential(multiplier=0.5, max=60)(retry_state)
+        return max(backoff, _retry_after(retry_state.outcome.exception()) or 0)
+
+    def _count_retry(self, retry_state):
+        self.retries += 1
+
+    async def _open(self, call, estimated_tokens, background, hold):
+        """Await call() with retries; with hold the slot of the successful attempt is kept for the caller to release"""
+        from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt
+
+        retrying = AsyncRetrying(
+            retry=retry_if_exception(_is_retryable),
+            wait=self._wait,
+            stop=stop_after_attempt(self.max_attempts),
+            before_sleep=self._count_retry,
+            reraise=True,
+        )
+        try:
+            async for attempt in retrying:
+                with attempt:
+                    await self._acquire(estimated_tokens, background)
+                    error = None
+                    try:
+                        response = await call()
+                    except BaseException as e:
+                        error = e
+                        raise
+                    finally:
+                        # Always give the slot back, also when the caller is cancelled
+                        if error is not None or not hold:
+                            await asyncio.shield(self._release(error, background))
+        except Exception as e:
+            self.failures += 1
+            raise LLMUnavailableError(f"OpenAI request failed: {e}") from e
+        return response
+
+    async def run(self, call, estimated_tokens, usage_tokens=None, background=False):
+        """Await call() within the rate budgets, retrying transient failures.
+
+        usage_tokens, if given, maps the response to the tokens it actually used
+        so the token bucket can be corrected. Background requests yield to
+        interactive ones. Raises LLMUnavailableError when the request fails for good.
+        """
+        response = await self._open(call, estimated_tokens, background, hold=False)
+        if usage_tokens is not None:
+            self.record_usage(estimated_tokens, usage_tokens(response))
+        return response
+
+    @asynccontextmanager
+    async def stream(self, call, estimated_tokens, background=False):
+        """Open a streamed response like run(), keeping its slot until the block exits.
+
+        A stream holds an HTTP connection for as long as it is read, so it counts
+        against the concurrency limit for that long too.
+        """
+        response = await self._open(call, estimated_tokens, background, hold=True)
+        error = None
+        try:
+            yield response
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await asyncio.shield(self._release(error, background))
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Correct the token bucket once a request reports the tokens it actually used"""
+        if actual_tokens is not None:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "background_in_flight": self.background_in_flight,
+            "interactive_waiting": self.interactive_waiting,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
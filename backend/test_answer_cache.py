@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import time
+from answer_cache import AnswerCache
+
+
+def test_answer_cache():
+    print("🧪 Testing answer cache...")
+    cache = AnswerCache(max_entries=3, ttl_seconds=60, similarity_threshold=0.95)
+    cache.set("repo", "sha1", "How do I run   the tests?", [1.0, 0.0, 0.0], "Run pytest")
+
+    assert cache.get_exact("repo", "sha1", "how do I run the tests?") == "Run pytest"
+    print("✅ Exact match ignores case and whitespace")
+
+    assert cache.get_similar("repo", "sha1", [0.99, 0.05, 0.0]) == "Run pytest"
+    assert cache.get_similar("repo", "sha1", [0.0, 1.0, 0.0]) is None
+    print("✅ Similar questions hit, unrelated ones miss")
+
+    assert cache.get_exact("repo", "sha2", "How do I run the tests?") is None
+    assert cache.get_similar("other-repo", "sha1", [1.0, 0.0, 0.0]) is None
+    print("✅ Entries are scoped to the repository revision")
+
+    for i in range(3):
+        cache.set("repo", "sha1", f"question {i}", [0.0, 1.0, float(i)], f"answer {i}")
+    assert cache.get_exact("repo", "sha1", "How do I run the tests?") is None
+    print("✅ Least recently used entry evicted")
+
+    cache.invalidate("repo")
+    assert cache.stats()["entries"] == 0
+    print("✅ Re-indexing drops the namespace")
+
+    expiring = AnswerCache(max_entries=10, ttl_seconds=0, similarity_threshold=0.95)
+    expiring.set("repo", "sha1", "question", [1.0, 0.0], "answer")
+    time.sleep(0.01)
+    assert expiring.get_exact("repo", "sha1", "question") is None
+    print("✅ Expired entries are ignored")
+
+    stats = cache.stats()
+    assert stats["exact_hits"] == 1 and stats["semantic_hits"] == 1, stats
+    print(f"✅ Stats: {stats}")
+
+
+def test_many_cached_questions():
+    print("🧪 Testing lookups among many cached questions...")
+    cache = AnswerCache(max_entries=10_000, ttl_seconds=60, similarity_threshold=0.95)
+    for i in range(5000):
+        cache.set("repo", "sha1", f"question {i}", [float(i), 1.0, float(i % 7)], f"answer {i}")
+    cache.set("repo", "sha2", "question 0", [0.0, 0.0, 1.0], "other revision")
+
+    started = time.perf_counter()
+    assert cache.get_similar("repo", "sha1", [0.0, 1.0, 0.0]) == "answer 0"
+    assert cache.get_similar("repo", "sha1", [0.0, 0.0, 1.0]) is None
+    elapsed = time.perf_counter() - started
+    cache.set("repo", "sha1", "new question", [0.0, 0.0, 1.0], "new answer")
+    assert cache.get_similar("repo", "sha1", [0.0, 0.0, 1.0]) == "new answer"
+    print(f"✅ Scored 5000 cached questions in {elapsed * 1000:.1f}ms, new entries included")
+
+
+if __name__ == "__main__":
+    test_answer_cache()
+    test_many_cached_questions()
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+
+from openai_utils import pack_embedding_batches
+
+
+def test_pack_embedding_batches():
+    print("🧪 Testing embedding batch packing...")
+
+    # Input-count limit
+    batches = pack_embedding_batches(["text"] * 7, max_inputs=3)
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]], batches
+    print(f"✅ Input-count limit respected: {batches}")
+
+    # Token limit
+    batches = pack_embedding_batches(["a" * 40] * 5, max_tokens=25)
+    assert all(len(batch) <= 2 for batch in batches), batches
+    print(f"✅ Token limit respected: {batches}")
+
+    # Order is preserved across batches
+    flattened = [i for batch in batches for i in batch]
+    assert flattened == list(range(5)), flattened
+    print("✅ Input order preserved")
+
+
+if __name__ == "__main__":
+    test_pack_embedding_batches()
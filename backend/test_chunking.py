@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import tempfile
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="dio_chunking_test_")
+
+from tokens import chunk_by_tokens, count_tokens
+import _openai
+
+
+def test_chunk_by_tokens():
+    print("🧪 Testing token chunking...")
+
+    # Small text stays in one chunk
+    assert chunk_by_tokens("print('hi')\n", 100) == ["print('hi')\n"]
+    print("✅ Small text is not split")
+
+    # Large text is split between lines, every chunk within budget, nothing lost
+    code = "".join(f"def function_{i}():\n    return {i}\n\n" for i in range(500))
+    chunks = chunk_by_tokens(code, 200)
+    assert len(chunks) > 1, chunks
+    assert all(count_tokens(chunk) <= 200 for chunk in chunks), [count_tokens(chunk) for chunk in chunks]
+    assert "".join(chunks) == code
+    print(f"✅ Split into {len(chunks)} chunks within budget")
+
+    # A single line longer than the budget is hard-split
+    chunks = chunk_by_tokens("x" * 5000, 100)
+    assert all(count_tokens(chunk) <= 100 for chunk in chunks)
+    assert "".join(chunks) == "x" * 5000
+    print(f"✅ Long line split into {len(chunks)} chunks")
+
+
+async def test_map_reduce_summary():
+    print("🧪 Testing map-reduce summaries...")
+    prompts = []
+
+    async def fake_completion(messages, background=False):
+        prompts.append(messages[-1]["content"])
+        return f"summary {len(prompts)}"
+
+    _openai.create_chat_completion = fake_completion
+    code = "".join(f"value_{i} = {i}\n" for i in range(20000))
+    summary = await _openai.getSummary("big_generated_file.py", code)
+
+    chunk_prompts = [prompt for prompt in prompts if "part " in prompt and "summaries of its parts" not in prompt]
+    assert len(chunk_prompts) == _openai.SUMMARY_MAX_CHUNKS, len(chunk_prompts)
+    assert "summaries of its parts" in prompts[-1]
+    assert all(count_tokens(prompt) <= _openai.SUMMARY_CHUNK_TOKENS + 200 for prompt in chunk_prompts)
+    print(f"✅ {len(chunk_prompts)} chunk summaries combined into: {summary}")
+
+    # The combined summary is cached
+    prompts.clear()
+    assert await _openai.getSummary("big_generated_file.py", code) == summary
+    assert not prompts
+    print("✅ Combined summary served from cache")
+
+
+if __name__ == "__main__":
+    test_chunk_by_tokens()
+    asyncio.run(test_map_reduce_summary())
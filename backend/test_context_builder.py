@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+from context_builder import Candidate, build_context, query_terms, relevant_windows
+from tokens import count_tokens
+
+
+def code_file(name, function, lines=300):
+    body = [f"# {name} line {i}: nothing to see here" for i in range(lines)]
+    body[lines // 2] = f"def {function}(session):"
+    return "\n".join(body)
+
+
+def test_query_terms():
+    print("🧪 Testing query terms...")
+    terms = query_terms("How does getUserSession handle the retry_count?")
+    assert {"getusersession", "user", "session", "retry_count", "retry", "count"} <= terms, terms
+    assert "how" not in terms and "the" not in terms
+    print(f"✅ Identifiers split into searchable terms: {sorted(terms)}")
+
+
+def test_relevant_windows():
+    print("🧪 Testing code windows...")
+    code = code_file("auth.py", "refresh_session")
+    window = relevant_windows(code, {"refresh_session"}, window=2)
+    assert window.splitlines() == ["...", *code.splitlines()[148:153], "..."]
+    assert relevant_windows(code, {"unmentioned"}) == code
+    print("✅ Only lines around mentions are kept")
+
+
+def test_build_context():
+    print("🧪 Testing token-budgeted context...")
+    candidates = [
+        Candidate("auth.py", "source:auth.py", 0.1, "Handles login sessions.", code_file("auth.py", "refresh_session")),
+        Candidate("db.py", "source:db.py", 0.2, "Database access helpers.", code_file("db.py", "connect")),
+        Candidate("auth.py", "source:auth.py", 0.3, "Handles login sessions.", code_file("auth.py", "refresh_session")),
+        Candidate("ui.py", "source:ui.py", 0.4, "Renders the login page.", code_file("ui.py", "render")),
+    ]
+    unlimited = sum(count_tokens(c.header + c.summary + c.body) for c in candidates)
+
+    context = build_context(candidates, "How is the session refreshed in refresh_session?", max_tokens=400)
+    assert context.tokens <= 420 and context.tokens == count_tokens(context.text), context.tokens
+    assert context.text.count("source:auth.py") == 1
+    assert context.included == 3 and context.omitted == 0
+    print(f"✅ Duplicates dropped; {unlimited} tokens of hits fit in {context.tokens}")
+
+    for summary in ["Handles login sessions.", "Database access helpers.", "Renders the login page."]:
+        assert summary in context.text
+    assert "def refresh_session(session):" in context.text
+    assert "# auth.py line 0:" not in context.text
+    print("✅ Every summary kept, code cut to the window around the question's terms")
+
+    tight = build_context(candidates, "refresh_session", max_tokens=60)
+    assert tight.tokens <= 70 and "code content:" not in tight.text
+    assert "Handles login sessions." in tight.text
+    print("✅ Summaries preferred over code when space is short")
+
+    snippets = [
+        Candidate("b", "meeting snippet [01:00-01:30]:", 0.1, body="we ship on friday", body_label=""),
+        Candidate("a", "meeting snippet [00:00-00:30]:", 0.5, body="welcome everyone", body_label=""),
+    ]
+    ordered = build_context(snippets, "when do we ship", max_tokens=200)
+    assert ordered.text.index("welcome") > ordered.text.index("friday")
+    print("✅ Hits rendered in the order given")
+
+
+if __name__ == "__main__":
+    test_query_terms()
+    test_relevant_windows()
+    test_build_context()
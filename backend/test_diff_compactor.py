@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+from diff_compactor import parse_unified_diff, omission_reason, compact_diff
+from tokens import count_tokens
+
+
+def file_diff(path, added, removed=0, context=3, line="value = compute(value)"):
+    lines = [
+        f"diff --git a/{path} b/{path}",
+        "index 1111111..2222222 100644",
+        f"--- a/{path}",
+        f"+++ b/{path}",
+        f"@@ -1,{removed + context} +1,{added + context} @@ def main():",
+    ]
+    lines += [f" context line {i}" for i in range(context)]
+    lines += [f"-old {line} {i}" for i in range(removed)]
+    lines += [f"+new {line} {i}" for i in range(added)]
+    return "\n".join(lines) + "\n"
+
+
+def test_parse_unified_diff():
+    print("🧪 Testing unified diff parsing...")
+    diff = file_diff("src/app.py", added=2, removed=1) + (
+        "diff --git a/logo.png b/logo.png\n"
+        "new file mode 100644\n"
+        "Binary files /dev/null and b/logo.png differ\n"
+    )
+    files = parse_unified_diff(diff)
+    assert [file.path for file in files] == ["src/app.py", "logo.png"]
+    app, logo = files
+    assert (app.added, app.removed) == (2, 1)
+    assert not any(line.startswith(" ") for hunk in app.hunks for line in hunk), "context lines kept"
+    assert app.hunks[0][0].startswith("@@") and "+++ b/src/app.py" in app.header
+    assert logo.binary
+    print("✅ Files, headers and changed lines parsed; context dropped")
+
+
+def test_omission_reasons():
+    print("🧪 Testing noisy file detection...")
+    reasons = {
+        path: omission_reason(parse_unified_diff(file_diff(path, added=1))[0])
+        for path in ["package-lock.json", "webapp/yarn.lock", "vendor/lib/x.go", "static/app.min.js", "src/app.py"]
+    }
+    assert reasons == {
+        "package-lock.json": "lockfile",
+        "webapp/yarn.lock": "lockfile",
+        "vendor/lib/x.go": "vendored file",
+        "static/app.min.js": "minified or generated file",
+        "src/app.py": None,
+    }, reasons
+    bundle = parse_unified_diff(file_diff("static/bundle.js", added=1, line="x" * 2000))[0]
+    assert omission_reason(bundle) == "minified or generated file"
+    print("✅ Lockfiles, vendored and minified files recognised")
+
+
+def test_compact_diff():
+    print("🧪 Testing diff compaction...")
+    diff = (
+        file_diff("package-lock.json", added=5000, removed=4000)
+        + file_diff("src/small.py", added=3)
+        + file_diff("src/big.py", added=400, removed=100)
+        + file_diff("src/medium.py", added=40)
+    )
+    compacted = compact_diff(diff, 1500)
+    assert count_tokens(compacted) <= 1500
+    assert "[lockfile changed: +5000 -4000 lines, contents omitted]" in compacted
+    assert "+new value = compute(value) 2" in compacted, "small file should be kept whole"
+    for path in ["src/small.py", "src/big.py", "src/medium.py"]:
+        assert f"diff --git a/{path} b/{path}" in compacted
+    assert "more changed lines omitted" in compacted
+    assert "context line" not in compacted
+    print(f"✅ {count_tokens(diff)} token diff compacted to {count_tokens(compacted)} tokens")
+
+    many = "".join(file_diff(f"src/module_{i}.py", added=1 + i % 7) for i in range(300))
+    compacted = compact_diff(many, 3000)
+    assert count_tokens(compacted) <= 3000
+    assert compacted.count("diff --git") > 10
+    assert "smaller changed files not shown" in compacted
+    print("✅ Commits touching hundreds of files keep representative hunks")
+
+    assert compact_diff("not a diff", 100) == "not a diff"
+    print("✅ Text without file headers is passed through")
+
+
+if __name__ == "__main__":
+    test_parse_unified_diff()
+    test_omission_reasons()
+    test_compact_diff()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="dio_cache_test_")
+
+from disk_cache import DiskCache
+
+
+def test_disk_cache():
+    print("🧪 Testing disk cache...")
+
+    cache = DiskCache("test", max_bytes=1000)
+    cache.set("a", b"hello")
+    assert cache.get("a") == b"hello"
+    assert cache.get("missing") is None
+    print("✅ Round trip works")
+
+    # Fill past the size limit; the oldest entries are evicted first
+    for i in range(30):
+        cache.set(f"key{i}", b"x" * 50)
+    stats = cache.stats()
+    assert stats["bytes"] <= 1000, stats
+    assert cache.get("key0") is None
+    assert cache.get("key29") == b"x" * 50
+    print(f"✅ Size-based eviction works: {stats}")
+
+    # Entries survive reopening the cache
+    reopened = DiskCache("test", max_bytes=1000)
+    assert reopened.get("key29") == b"x" * 50
+    print("✅ Entries persist on disk")
+
+
+if __name__ == "__main__":
+    test_disk_cache()
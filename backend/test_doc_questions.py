@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import os
+import tempfile
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="dio_doc_questions_test_")
+
+import doc_questions
+
+
+def test_configured_sections():
+    print("🧪 Testing configurable question set...")
+    assert len(doc_questions.load_sections()) == 12
+    print("✅ Default question set loaded")
+
+    path = os.path.join(tempfile.mkdtemp(), "questions.json")
+    with open(path, "w") as f:
+        json.dump([{"id": "intro", "title": "Intro", "question": "What is it?"}], f)
+    doc_questions.DOC_QUESTIONS_FILE = path
+    doc_questions._sections = None
+    sections = doc_questions.load_sections()
+    assert sections == [{"id": "intro", "title": "Intro", "question": "What is it?"}]
+    print("✅ Question set read from DOC_QUESTIONS_FILE")
+
+    html = doc_questions.render_documentation("dio", sections, ["<p>An app</p>"])
+    assert '<a href="#intro">Intro</a>' in html and '<h2 id="intro">Intro</h2>' in html and "<p>An app</p>" in html
+    print("✅ Documentation rendered from the configured sections")
+
+
+async def test_question_vectors_computed_once():
+    print("🧪 Testing precomputed question vectors...")
+    calls = []
+
+    async def fake_embeddings_batch(texts):
+        calls.append(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    doc_questions.get_embeddings_batch = fake_embeddings_batch
+    sections = doc_questions.DEFAULT_SECTIONS
+    first = await doc_questions.question_vectors(sections)
+    second = await doc_questions.question_vectors(sections)
+    assert first == second and len(first) == len(sections)
+    assert len(calls) == 1 and len(calls[0]) == len(sections)
+    print("✅ Questions embedded in one batch, once per process")
+
+
+if __name__ == "__main__":
+    test_configured_sections()
+    asyncio.run(test_question_vectors_computed_once())
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="dio_cache_test_")
+
+from embedding_cache import EmbeddingCache
+
+
+def test_embedding_cache():
+    print("🧪 Testing embedding cache...")
+
+    cache = EmbeddingCache(max_entries=2, disk_max_bytes=1024 * 1024)
+    assert cache.get("model", "hello world") is None
+    cache.set("model", "hello world", [0.25, 0.5, 0.75])
+
+    # Whitespace differences share one entry
+    assert cache.get("model", "hello\nworld ") == [0.25, 0.5, 0.75]
+    # Different models do not
+    assert cache.get("other-model", "hello world") is None
+    print("✅ Keys normalise text and include the model")
+
+    # Evicted from memory, still served from disk
+    cache.set("model", "second", [1.0])
+    cache.set("model", "third", [2.0])
+    assert cache.get("model", "hello world") == [0.25, 0.5, 0.75]
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1 and stats["disk_hits"] == 1 and stats["misses"] == 2, stats
+    print(f"✅ Disk tier backs the LRU: {stats}")
+
+
+if __name__ == "__main__":
+    test_embedding_cache()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import time
+import tempfile
+
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="dio_file_tree_test_")
+
+import file_tree
+from file_tree import FileTree, remember_file_tree, get_file_tree
+
+NODE = re.compile(r'^    n\d+\["[^"]*"\]$')
+EDGE = re.compile(r"^    n\d+-->n\d+$")
+
+
+def test_mermaid_graph():
+    print("🧪 Testing Mermaid file tree...")
+    paths = [
+        "README.md",
+        "src/app.py",
+        "src/app.py",
+        "src/my file.v2-final.py",
+        'src/say "hi".py',
+        "src/utils/strings.py",
+        "src/utils/deep/er/than/allowed.py",
+    ]
+    graph = FileTree(paths).to_mermaid(max_depth=3, max_children=20)
+    lines = graph.splitlines()
+    assert lines[0] == "graph TD;"
+    assert all(NODE.match(line) or EDGE.match(line) for line in lines[1:]), graph
+    print("✅ Node ids are generated, labels quoted")
+
+    assert graph.count('"app.py"') == 1 and len(set(lines)) == len(lines)
+    assert '"say #quot;hi#quot;.py"' in graph
+    assert '"deep/ (1 files)"' in graph and "allowed.py" not in graph
+    print("✅ Duplicates removed, deep directories collapsed")
+
+
+def test_large_repository():
+    print("🧪 Testing a 20k-file repository...")
+    paths = [f"pkg{i % 40}/module{i % 500}/file{i}.py" for i in range(20_000)]
+    started = time.perf_counter()
+    tree = FileTree(paths)
+    graph = tree.to_mermaid(max_depth=3, max_children=20, max_nodes=400)
+    elapsed = time.perf_counter() - started
+    nodes = sum(1 for line in graph.splitlines() if NODE.match(line))
+    assert nodes <= 400, nodes
+    assert "20 more entries" in graph and "files)" in graph
+    print(f"✅ {len(paths)} files rendered as {nodes} nodes in {elapsed * 1000:.0f}ms")
+
+
+def test_subtrees():
+    print("🧪 Testing lazily expanded subtrees...")
+    tree = FileTree(["a/b/c/d.py", "a/b/e.py", "a/f.py"] + [f"big/{i}.py" for i in range(30)])
+    top = tree.subtree("", max_depth=1)
+    assert [child["name"] for child in top["children"]] == ["a", "big"]
+    assert top["children"][0] == {"type": "dir", "name": "a", "path": "a", "files": 3, "children": None}
+
+    expanded = tree.subtree("a/b", max_depth=1)
+    assert [child["path"] for child in expanded["children"]] == ["a/b/c", "a/b/e.py"]
+
+    big = tree.subtree("big", max_depth=1, max_children=10)
+    assert big["children"][-1] == {"type": "more", "count": 20, "files": 20}
+    assert tree.subtree("missing") is None
+    print("✅ Collapsed directories expand on request")
+
+
+def test_persisted_trees():
+    print("🧪 Testing remembered trees...")
+    remember_file_tree("repo", ["src/app.py"])
+    file_tree._trees.clear()
+    assert get_file_tree("repo").subtree("src")["children"][0]["path"] == "src/app.py"
+    assert get_file_tree("unknown") is None
+    print("✅ Trees reloaded from disk after a restart")
+
+
+if __name__ == "__main__":
+    test_mermaid_graph()
+    test_large_repository()
+    test_subtrees()
+    test_persisted_trees()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+import asyncio
+import httpx
+import github_client
+from github_client import GithubError, commit_diff_url, fetch_commit_diff
+
+
+def test_commit_diff_url():
+    print("🧪 Testing commit diff URLs...")
+    assert commit_diff_url("https://github.com/owner/repo.git", "abc") == "https://api.github.com/repos/owner/repo/commits/abc"
+    assert commit_diff_url("https://git.example.com/owner/repo/", "abc") == "https://git.example.com/owner/repo/commit/abc.diff"
+    print("✅ github.com repositories use the API, other hosts the web URL")
+
+
+async def test_fetch_commit_diff():
+    print("🧪 Testing streamed diff download...")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.path.endswith("/missing"):
+            return httpx.Response(404, text="Not Found")
+        return httpx.Response(200, content=b"diff --git a/x b/x\n" + "+é\n".encode("utf-8") * 100_000)
+
+    github_client._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    diff = await fetch_commit_diff("https://github.com/owner/repo", "abc", max_bytes=1000)
+    assert len(diff.encode("utf-8")) <= 1000 + 3 and diff.startswith("diff --git")
+    assert requests[0].headers["Accept"] == "application/vnd.github.v3.diff"
+    print(f"✅ Read only {len(diff)} characters of a large diff")
+
+    try:
+        await fetch_commit_diff("https://github.com/owner/repo", "missing")
+    except GithubError as e:
+        print(f"✅ HTTP errors raise GithubError: {e}")
+    else:
+        raise AssertionError("expected GithubError")
+
+    # Every request goes through the one pooled client
+    assert github_client.get_http_client() is github_client.get_http_client()
+    await github_client.close_github_client()
+    print("✅ Shared client closed")
+
+
+if __name__ == "__main__":
+    test_commit_diff_url()
+    asyncio.run(test_fetch_commit_diff())
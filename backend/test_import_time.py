@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+
+# Fails when importing the app takes longer than this many milliseconds
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000"))
+
+# Only loaded by the endpoints that use them
+DEFERRED_MODULES = ["openai", "httpx", "assemblyai", "git", "numpy", "weaviate", "tenacity", "langchain_text_splitters"]
+
+
+def run_python(*args):
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.run(
+        [sys.executable, *args], cwd=backend_dir, capture_output=True, text=True, check=True
+    )
+
+
+def test_import_time():
+    print("🧪 Testing backend import time...")
+    # Warm the bytecode cache so the measurement does not include compiling
+    run_python("-c", "import main")
+
+    result = run_python("-X", "importtime", "-c", "import main")
+    main_line = [line for line in result.stderr.splitlines() if line.rstrip().endswith("| main")][-1]
+    elapsed_ms = int(main_line.split("|")[1]) / 1000
+    assert elapsed_ms <= IMPORT_TIME_BUDGET_MS, f"importing main took {elapsed_ms:.0f}ms (budget {IMPORT_TIME_BUDGET_MS:.0f}ms)"
+    print(f"✅ main imported in {elapsed_ms:.0f}ms (budget {IMPORT_TIME_BUDGET_MS:.0f}ms)")
+
+
+def test_heavy_imports_deferred():
+    print("🧪 Testing heavy dependencies are not imported at startup...")
+    result = run_python("-c", f"import sys, main; print(' '.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))")
+    loaded = result.stdout.split()
+    assert not loaded, f"imported at startup: {loaded}"
+    print("✅ No heavy dependency imported at startup")
+
+
+if __name__ == "__main__":
+    test_import_time()
+    test_heavy_imports_deferred()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+import asyncio
+from ingestion import BatchWriter
+
+
+class FakeStore:
+    """Records batches and rejects objects whose "reject" property is set"""
+
+    def __init__(self):
+        self.batches = []
+
+    def insert_many(self, namespace, objects):
+        self.batches.append(len(objects))
+        return [(i, "rejected") for i, obj in enumerate(objects) if obj["properties"].get("reject")]
+
+
+async def test_batch_writer():
+    print("🧪 Testing batch writer...")
+
+    store = FakeStore()
+    async with BatchWriter(store, "repo", batch_size=10, max_batch_size=40, linger=0.01) as writer:
+        for i in range(200):
+            await writer.put({"properties": {"n": i, "reject": i % 50 == 0}, "vector": [0.0]})
+
+    stats = writer.stats()
+    assert sum(store.batches) == 200, store.batches
+    assert stats["written"] == 196 and stats["failed"] == 4, stats
+    assert [failure["properties"]["n"] for failure in writer.failures] == [0, 50, 100, 150]
+    print(f"✅ Per-object failures reported without dropping batches: {stats}")
+
+    assert max(store.batches) > 10, store.batches
+    print(f"✅ Batch size grew with fast flushes: {store.batches}")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_batch_writer())
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+
+os.environ["VECTOR_STORE_DIR"] = tempfile.mkdtemp(prefix="dio_vectors_test_")
+
+import numpy as np
+import local_vector_store
+from local_vector_store import LocalVectorStore
+
+
+def make_objects(vectors):
+    return [
+        {"properties": {"source": f"file{i}.py", "group": i % 3}, "vector": vector.tolist()}
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def test_local_vector_store():
+    print("🧪 Testing local vector store...")
+
+    vectors = np.random.default_rng(0).normal(size=(300, 32)).astype(np.float32)
+    store = LocalVectorStore("test")
+    assert store.insert_many("repo", make_objects(vectors)) == []
+
+    hits = store.query("repo", vectors[42], 3)
+    assert hits[0].properties["source"] == "file42.py" and hits[0].distance < 1e-5
+    assert [hit.distance for hit in hits] == sorted(hit.distance for hit in hits)
+    print("✅ Nearest neighbour found first")
+
+    hits = store.query("repo", vectors[42], 5, where={"group": [1, 2]}, return_properties=["source"])
+    assert all(int(hit.properties["source"][4:-3]) % 3 != 0 for hit in hits)
+    assert set(hits[0].properties) == {"source"}
+    print("✅ Property filters and projections work")
+
+    assert store.query("other-repo", vectors[42], 3) == []
+    print("✅ Namespaces are isolated")
+
+    batched = store.query_many("repo", [vectors[1], vectors[2], vectors[3]], 4)
+    single = [store.query("repo", vector, 4) for vector in (vectors[1], vectors[2], vectors[3])]
+    assert [[hit.uuid for hit in hits] for hits in batched] == [[hit.uuid for hit in hits] for hits in single]
+    print("✅ Batched queries match single queries")
+
+    assert store.delete("repo", {"source": "file42.py"}) == 1
+    reopened = LocalVectorStore("test")
+    hits = reopened.query("repo", vectors[42], 1)
+    assert hits[0].properties["source"] != "file42.py"
+    print("✅ Deletes persist across reopening")
+
+    # Clustered search still finds exact matches
+    local_vector_store.LOCAL_CLUSTER_MIN_VECTORS = 100
+    clustered = LocalVectorStore("test")
+    hits = clustered.query("repo", vectors[7], 1)
+    assert hits[0].properties["source"] == "file7.py", hits
+    print("✅ Clustered search works")
+
+
+if __name__ == "__main__":
+    test_local_vector_store()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import re
+import tempfile
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["VECTOR_STORE_DIR"] = tempfile.mkdtemp(prefix="dio_meeting_test_")
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="dio_meeting_cache_")
+
+import assembly
+import transcription
+from transcription import FakeTranscriptionService
+
+TOPICS = ["login", "session", "cache", "database", "migration", "friday", "budget", "hiring"]
+LOGIN = "the login page is slow so cache the session lookup "
+MIGRATION = "the database migration runs on friday with a new script "
+prompts = []
+
+
+def embed(text):
+    words = re.findall(r"[a-z]+", text.lower())
+    return [float(words.count(topic)) for topic in TOPICS] + [0.1]
+
+
+async def fake_embeddings_batch(texts, background=False):
+    return [embed(text) for text in texts]
+
+
+async def fake_embeddings(text):
+    return embed(text)
+
+
+async def fake_chat_completion(messages):
+    prompts.append(messages[0]["content"])
+    return "answer"
+
+
+assembly.get_embeddings_batch = fake_embeddings_batch
+assembly.get_embeddings = fake_embeddings
+assembly.create_chat_completion = fake_chat_completion
+assembly.MEETING_CHUNK_CHARS = 200
+assembly.MEETING_CHUNK_OVERLAP_CHARS = 30
+
+# 130 words about the login page in the first 65 seconds, 170 about the migration in the remaining 85
+meeting = FakeTranscriptionService(delay_seconds=0, text=LOGIN * 13 + MIGRATION * 17)
+
+
+def test_transcript_levels():
+    print("🧪 Testing chapter and chunk levels...")
+    transcript = asyncio.run(_completed(meeting))
+    chapters, chunks = assembly.transcript_levels(transcript)
+    assert [chapter["chapter"] for chapter in chapters] == ["0", "1"]
+    assert chapters[1]["start"] == "01:05" and "migration" in chapters[1]["text"]
+
+    for chunk in chunks:
+        if chunk["chapter"] == "0":
+            assert "database" not in chunk["text"], chunk
+        else:
+            assert "login" not in chunk["text"], chunk
+    print(f"✅ {len(chunks)} chunks, none crossing a chapter boundary")
+
+    first_migration = next(chunk for chunk in chunks if chunk["chapter"] == "1")
+    assert chunks[0]["start"] == "00:00" and first_migration["start"] == "01:05", first_migration
+    assert first_migration["start_ms"] >= 65000 and chunks[0]["start_ms"] == 0
+    assert chunks[0]["text"].split()[-5:] == chunks[1]["text"].split()[:5]
+    print("✅ Chunks carry timestamps and overlap their neighbours")
+
+    untimed = assembly.transcript_levels({"text": "no timings here", "chapters": []})
+    assert untimed == ([], [{"text": "no timings here", "chapter": "0", "start": "", "end": ""}])
+    print("✅ Transcripts without timings fall back to one flat level")
+
+
+def test_long_meeting_times():
+    print("🧪 Testing timestamps past the first hour...")
+    assert assembly.ms_to_time(65_000) == "01:05"
+    assert assembly.ms_to_time(59 * 60_000 + 59_000) == "59:59"
+    assert assembly.ms_to_time(3_600_000) == "1:00:00"
+    assert assembly.ms_to_time(2 * 3_600_000 + 5 * 60_000 + 9_000) == "2:05:09"
+    print("✅ Hours are shown instead of wrapping the minutes")
+
+
+async def _completed(service):
+    return await service.get(await service.submit("https://example.com/meeting.mp3"))
+
+
+async def test_two_stage_retrieval():
+    print("🧪 Testing chapter-then-chunk retrieval...")
+    transcription._service = meeting
+    await assembly.transcribe_file("https://example.com/planning.mp3")
+    other = {"text": "the budget and hiring plan " * 20, "chapters": []}
+    await assembly.index_transcript("https://example.com/other.mp3", other)
+
+    assembly.MEETING_CHAPTERS_K = 1
+    await assembly.ask_meeting("https://example.com/planning.mp3", "When does the database migration run?", "")
+    context = prompts[-1]
+    assert "database migration" in context and "login" not in context, context
+    assert "[01:" in context
+    assert "budget" not in context
+    print("✅ Only chunks of the relevant chapter reach the prompt, with timestamps")
+
+    assembly.MEETING_CHAPTERS_K = 2
+    await assembly.ask_meeting(
+        "https://example.com/planning.mp3", "When does the database migration run?", "the login page is slow"
+    )
+    assert "login" in prompts[-1] and "migration" in prompts[-1]
+    print("✅ The quoted passage's chapter is searched too")
+
+    await assembly.transcribe_file("https://example.com/planning.mp3")
+    chapters, chunks = assembly.transcript_levels(await _completed(meeting))
+    store = assembly.get_vector_store(assembly.MEETING_COLLECTION)
+    stored = store.delete(assembly.serialise_url("https://example.com/planning.mp3"))
+    assert stored == len(chapters) + len(chunks), stored
+    print("✅ Transcribing again replaces the meeting's chunks")
+
+
+if __name__ == "__main__":
+    test_transcript_levels()
+    test_long_meeting_times()
+    asyncio.run(test_two_stage_retrieval())
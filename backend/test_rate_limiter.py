@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import asyncio
+import httpx
+import openai
+from rate_limiter import RequestScheduler, TokenBucket, LLMUnavailableError
+
+
+def rate_limit_error(retry_after="0"):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def test_token_bucket():
+    print("🧪 Testing token bucket...")
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60) == 0
+    bucket.consume(60)
+    wait = bucket.wait_time(1)
+    assert 0.9 < wait <= 1.0, wait
+    print(f"✅ Empty bucket waits {wait:.2f}s for one unit at 60/min")
+
+
+async def test_retries_after_rate_limit():
+    print("🧪 Testing retry after a 429...")
+    scheduler = RequestScheduler(requests_per_minute=6000, tokens_per_minute=1_000_000, max_concurrency=8)
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise rate_limit_error()
+        return "ok"
+
+    assert await scheduler.run(call, 10) == "ok"
+    stats = scheduler.stats()
+    assert calls == 3 and stats["rate_limited"] == 2, stats
+    assert stats["concurrency"] < 8, stats
+    print(f"✅ Succeeded after {calls} attempts, concurrency reduced to {stats['concurrency']}")
+
+
+async def test_raises_instead_of_placeholder():
+    print("🧪 Testing permanent failure...")
+    scheduler = RequestScheduler(requests_per_minute=6000, tokens_per_minute=1_000_000, max_concurrency=4, max_attempts=2)
+
+    async def call():
+        raise rate_limit_error()
+
+    try:
+        await scheduler.run(call, 10)
+    except LLMUnavailableError as e:
+        print(f"✅ Raised LLMUnavailableError: {e}")
+    else:
+        raise AssertionError("expected LLMUnavailableError")
+
+
+async def test_concurrency_limit():
+    print("🧪 Testing concurrency limit...")
+    scheduler = RequestScheduler(requests_per_minute=6000, tokens_per_minute=1_000_000, max_concurrency=3)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        peak = max(peak, scheduler.in_flight)
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    await asyncio.gather(*[scheduler.run(call, 10) for _ in range(20)])
+    assert peak <= 3, peak
+    print(f"✅ At most {peak} requests in flight")
+
+
+async def test_cancelled_calls_release_slots():
+    print("🧪 Testing cancelled calls...")
+    scheduler = RequestScheduler(requests_per_minute=6000, tokens_per_minute=1_000_000, max_concurrency=2)
+
+    async def hang():
+        await asyncio.sleep(60)
+
+    async def call():
+        return "ok"
+
+    hanging = [asyncio.create_task(scheduler.run(hang, 10)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    assert scheduler.in_flight == 2
+    for task in hanging:
+        task.cancel()
+    await asyncio.gather(*hanging, return_exceptions=True)
+    assert scheduler.in_flight == 0, scheduler.stats()
+    assert await asyncio.wait_for(scheduler.run(call, 10), 1) == "ok"
+    assert scheduler.stats()["concurrency"] == 2
+    print("✅ Cancelled calls gave their slots back")
+
+
+async def test_interactive_requests_go_first():
+    print("🧪 Testing priority of interactive requests...")
+    scheduler = RequestScheduler(requests_per_minute=6000, tokens_per_minute=1_000_000, max_concurrency=4, interactive_reserve=0.25)
+    order = []
+    peak_background = 0
+
+    def call(name, delay):
+        async def request():
+            nonlocal peak_background
+            peak_background = max(peak_background, scheduler.background_in_flight)
+            await asyncio.sleep(delay)
+            order.append(name)
+            return name
+
+        return request
+
+    indexing = [asyncio.create_task(scheduler.run(call(f"index {i}", 0.05), 10, background=True)) for i in range(12)]
+    await asyncio.sleep(0.01)
+    assert scheduler.in_flight == 3, scheduler.stats()
+    started = asyncio.get_running_loop().time()
+    assert await scheduler.run(call("ask", 0), 10) == "ask"
+    waited = asyncio.get_running_loop().time() - started
+    await asyncio.gather(*indexing)
+    assert peak_background == 3, peak_background
+    assert waited < 0.03 and order.index("ask") <= 3, (waited, order)
+    print(f"✅ Background work left a slot free; the question waited {waited * 1000:.0f}ms behind {order.index('ask')} requests")
+
+
+if __name__ == "__main__":
+    test_token_bucket()
+    asyncio.run(test_retries_after_rate_limit())
+    asyncio.run(test_raises_instead_of_placeholder())
+    asyncio.run(test_concurrency_limit())
+    asyncio.run(test_cancelled_calls_release_slots())
+    asyncio.run(test_interactive_requests_go_first())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import tempfile
+import types
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="dio_streaming_test_")
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["VECTOR_STORE_DIR"] = tempfile.mkdtemp(prefix="dio_streaming_store_")
+
+import openai_utils
+from rate_limiter import LLMUnavailableError
+
+
+class FakeStream:
+    def __init__(self, parts, fail_after=None):
+        self.parts = parts
+        self.fail_after = fail_after
+        self.closed = False
+
+    async def _chunks(self):
+        for i, part in enumerate(self.parts):
+            if i == self.fail_after:
+                raise ConnectionError("connection reset")
+            yield types.SimpleNamespace(usage=None, choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=part))])
+        yield types.SimpleNamespace(usage=types.SimpleNamespace(total_tokens=42), choices=[])
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def close(self):
+        self.closed = True
+
+
+def fake_client(stream):
+    async def create(**kwargs):
+        assert kwargs["stream"] is True
+        return stream
+
+    return types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+
+
+async def test_stream_chat_completion():
+    print("🧪 Testing streamed chat completions...")
+    messages = [{"role": "user", "content": "hello"}]
+
+    stream = FakeStream(["Hel", "lo", "!"])
+    openai_utils.get_openai_client = lambda: fake_client(stream)
+    parts = []
+    async for part in openai_utils.stream_chat_completion(messages):
+        parts.append(part)
+        assert openai_utils.scheduler.in_flight == 1, "a stream being read holds its slot"
+    assert parts == ["Hel", "lo", "!"], parts
+    assert stream.closed and openai_utils.scheduler.in_flight == 0
+    print(f"✅ Streamed {len(parts)} pieces in order and closed the stream")
+
+    stream = FakeStream(["Hel", "lo", "!"], fail_after=2)
+    openai_utils.get_openai_client = lambda: fake_client(stream)
+    received = []
+    try:
+        async for part in openai_utils.stream_chat_completion(messages):
+            received.append(part)
+    except LLMUnavailableError as e:
+        assert received == ["Hel", "lo"] and stream.closed
+        assert openai_utils.scheduler.in_flight == 0
+        print(f"✅ Failure mid-stream raised LLMUnavailableError: {e}")
+    else:
+        raise AssertionError("expected LLMUnavailableError")
+
+
+def test_stream_reports_unexpected_errors():
+    print("🧪 Testing unexpected errors in SSE endpoints...")
+    from fastapi.testclient import TestClient
+    import main
+
+    async def failing_answer(query, namespace):
+        yield "partial"
+        raise KeyError("summary")
+
+    async def failing_start(github_url, progress):
+        raise RuntimeError("clone failed")
+
+    main.ask_stream = failing_answer
+    main.start_documentation = failing_start
+    client = TestClient(main.app)
+    body = {"query": "what is this?", "github_url": "https://github.com/owner/repo"}
+    answer = client.post("/ask/stream", json=body).text
+    assert "event: token" in answer and "event: error" in answer and "event: done" not in answer, answer
+    documentation = client.post("/generate_documentation/stream", json={"github_url": body["github_url"]}).text
+    assert documentation.rstrip().endswith('data: {"detail": "clone failed"}'), documentation
+    print("✅ Streams end with an error event instead of a cut connection")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_stream_chat_completion())
+    test_stream_reports_unexpected_errors()
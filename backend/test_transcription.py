@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import time
+import tempfile
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["VECTOR_STORE_DIR"] = tempfile.mkdtemp(prefix="dio_transcription_test_")
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="dio_transcription_cache_")
+
+import transcription
+from transcription import FakeTranscriptionService, TranscriptionError, notify_transcript, wait_for_transcript
+from jobs import JobManager
+
+
+class FailingTranscriptionService(FakeTranscriptionService):
+    async def get(self, transcript_id):
+        return {"id": transcript_id, "status": "error", "error": "unsupported audio"}
+
+
+async def test_wait_does_not_block():
+    print("🧪 Testing transcript polling...")
+    transcription.TRANSCRIPTION_POLL_INTERVAL_SECONDS = 0.05
+    service = FakeTranscriptionService(delay_seconds=0.3)
+    transcript_id = await service.submit("https://example.com/meeting.mp3")
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticking = asyncio.create_task(ticker())
+    transcript = await wait_for_transcript(transcript_id, service)
+    ticking.cancel()
+    assert transcript["status"] == "completed" and transcript["chapters"]
+    assert ticks >= 15, ticks
+    print(f"✅ Event loop kept running while waiting ({ticks} ticks)")
+
+
+async def test_webhook_wakes_waiter():
+    print("🧪 Testing webhook notification...")
+    transcription.TRANSCRIPTION_POLL_INTERVAL_SECONDS = 30
+    service = FakeTranscriptionService(delay_seconds=0.1)
+    transcript_id = await service.submit("https://example.com/meeting.mp3")
+
+    async def webhook():
+        await asyncio.sleep(0.2)
+        assert notify_transcript(transcript_id)
+
+    started = time.monotonic()
+    asyncio.create_task(webhook())
+    await wait_for_transcript(transcript_id, service)
+    elapsed = time.monotonic() - started
+    assert elapsed < 1, elapsed
+    assert not notify_transcript(transcript_id), "finished transcripts should not be waited on"
+    print(f"✅ Webhook completed the wait in {elapsed:.2f}s instead of the next poll")
+
+
+async def test_failures():
+    print("🧪 Testing failed transcripts...")
+    service = FailingTranscriptionService()
+    try:
+        await wait_for_transcript(await service.submit("https://example.com/broken.mp3"), service)
+    except TranscriptionError as e:
+        print(f"✅ Failed transcript raises TranscriptionError: {e}")
+    else:
+        raise AssertionError("expected TranscriptionError")
+
+    transcription.TRANSCRIPTION_POLL_INTERVAL_SECONDS = 0.05
+    slow = FakeTranscriptionService(delay_seconds=10)
+    try:
+        await wait_for_transcript(await slow.submit("https://example.com/long.mp3"), slow, timeout=0.2)
+    except TranscriptionError as e:
+        print(f"✅ Timed out waiting: {e}")
+    else:
+        raise AssertionError("expected TranscriptionError")
+
+
+async def test_transcription_jobs_have_own_slots():
+    print("🧪 Testing per-kind job limits...")
+    manager = JobManager(max_workers=1, kind_workers={"transcription": 5})
+    release = asyncio.Event()
+
+    async def wait(job):
+        await release.wait()
+
+    async def quick(job):
+        return "indexed"
+
+    transcriptions = [manager.submit("transcription", wait) for _ in range(3)]
+    indexing = manager.submit("indexing", quick)
+    await asyncio.sleep(0.05)
+    assert all(job.status == "running" for job in transcriptions)
+    assert indexing.status == "succeeded" and indexing.result == "indexed"
+    release.set()
+    await asyncio.gather(*[job.task for job in transcriptions])
+    print("✅ Waiting transcriptions do not hold up indexing")
+
+
+async def test_transcribe_file():
+    print("🧪 Testing background meeting transcription...")
+    import types
+    import openai_utils
+    import assembly
+    from assembly import transcribe_file
+
+    async def create(model, input):
+        return types.SimpleNamespace(data=[types.SimpleNamespace(index=i, embedding=[1.0, 0.0, float(i)]) for i in range(len(input))])
+
+    openai_utils.get_openai_client = lambda: types.SimpleNamespace(embeddings=types.SimpleNamespace(create=create))
+    transcription._service = FakeTranscriptionService(delay_seconds=0.1)
+    progress = {}
+    summaries = await transcribe_file("https://example.com/meeting.mp3", progress)
+    assert summaries[0]["gist"] == "Release planning" and summaries[1]["start"] == "01:05", summaries
+    assert progress["stage"] == "done" and progress["transcript_id"]
+    store = assembly.get_vector_store(assembly.MEETING_COLLECTION)
+    assert store.query(assembly.serialise_url("https://example.com/meeting.mp3"), [1.0, 0.0, 0.0], 10, where={"level": "chapter"})
+    print(f"✅ Transcribed and indexed {len(summaries)} chapters")
+
+
+async def main():
+    await test_wait_does_not_block()
+    await test_webhook_wakes_waiter()
+    await test_failures()
+    await test_transcription_jobs_have_own_slots()
+    await test_transcribe_file()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import types
+import tempfile
+
+os.environ["VECTOR_STORE_DIR"] = tempfile.mkdtemp(prefix="dio_weaviate_client_test_")
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="dio_weaviate_client_cache_")
+
+import vector_store
+from weaviate_client import WeaviateConnection
+from vector_store import TenantVectorStore, WeaviateVectorStore, VectorStoreUnavailableError, tenant_name, get_vector_store
+
+
+class FakeCollections:
+    def __init__(self, existing=None):
+        self.created = []
+        self.deleted = []
+        # name -> properties of collections that existed before the backend connected
+        self.existing = existing or {}
+
+    def exists(self, name):
+        return name in self.created or name in self.existing
+
+    def create(self, name, **kwargs):
+        self.created.append(name)
+
+    def delete(self, name):
+        self.deleted.append(name)
+        del self.existing[name]
+
+    def get(self, name):
+        if name in self.existing:
+            properties = [types.SimpleNamespace(name=prop, tokenization=tokenization) for prop, tokenization in self.existing[name]]
+            config = types.SimpleNamespace(properties=properties, multi_tenancy_config=types.SimpleNamespace(enabled=False))
+            return types.SimpleNamespace(config=types.SimpleNamespace(get=lambda: config))
+        return f"collection:{name}"
+
+
+class FakeClient:
+    def __init__(self, existing=None):
+        self.collections = FakeCollections(existing)
+        self.ready = True
+        self.closed = False
+
+    def is_ready(self):
+        return self.ready
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection(WeaviateConnection):
+    def __init__(self, existing=None):
+        super().__init__(health_check_interval=0)
+        self.clients = []
+        self.reachable = True
+        self.existing = existing
+
+    def _connect(self):
+        if not self.reachable:
+            raise ConnectionError("connection refused")
+        client = FakeClient(self.existing)
+        self.clients.append(client)
+        return client
+
+
+def test_weaviate_connection():
+    print("🧪 Testing shared Weaviate connection...")
+    connection = FakeConnection()
+    assert not connection.clients
+    print("✅ Nothing connects until first use")
+
+    assert connection.get_collection("chatpdf") == "collection:chatpdf"
+    assert connection.get_collection("chatpdf") == "collection:chatpdf"
+    assert len(connection.clients) == 1
+    assert connection.clients[0].collections.created == ["chatpdf"]
+    print("✅ One client reused, collection created once")
+
+    # Weaviate restarts: the failed health check rebuilds the client
+    connection.clients[0].ready = False
+    assert connection.get_collection("chatpdf") == "collection:chatpdf"
+    assert len(connection.clients) == 2 and connection.clients[0].closed
+    assert connection.reconnects == 1
+    print("✅ Reconnected after a failed health check")
+
+    # Weaviate is down: callers get None, and recover once it is back
+    connection.clients[1].ready = False
+    connection.reachable = False
+    assert connection.get_collection("chatpdf") is None
+    connection.reachable = True
+    assert connection.get_collection("chatpdf") == "collection:chatpdf"
+    print("✅ Recovered after Weaviate came back")
+
+    connection.close()
+    assert connection.clients[-1].closed and connection.client is None
+    print("✅ Closed cleanly")
+
+
+def test_incompatible_schema_recreated():
+    print("🧪 Testing collections created before exact-match filters...")
+    from index_state import get_indexed_commit, set_indexed_commit
+    from weaviate_client import store_id
+
+    fields = [("source", "field"), ("code", "word"), ("summary", "word"), ("namespace", "field")]
+    compatible = FakeConnection({"chatpdf": fields})
+    assert compatible.get_collection("chatpdf") is not None
+    assert not compatible.clients[0].collections.deleted
+    print("✅ Collections with field-tokenized filters are kept")
+
+    legacy = FakeConnection({"chatpdf": [("source", "word"), ("code", "word"), ("summary", "word")]})
+    set_indexed_commit("repo", store_id(legacy.url, "chatpdf"), "abc123")
+    assert legacy.get_collection("chatpdf") == "collection:chatpdf"
+    collections = legacy.clients[0].collections
+    assert collections.deleted == ["chatpdf"] and collections.created == ["chatpdf"]
+    assert get_indexed_commit("repo", store_id(legacy.url, "chatpdf")) is None
+    print("✅ A word-tokenized source recreates the collection and its repositories are indexed again")
+
+
+class FakeTenantCollection:
+    """Multi-tenant collection keeping the objects of each tenant apart"""
+
+    def __init__(self):
+        self.objects = {}
+        self.searched = []
+        self.tenants = types.SimpleNamespace(exists=lambda name: name in self.objects, remove=self.objects.pop)
+
+    def with_tenant(self, tenant):
+        assert re.fullmatch(r"[A-Za-z0-9_-]{1,64}", tenant), tenant
+
+        def insert_many(data):
+            self.objects.setdefault(tenant, []).extend(data)
+            return types.SimpleNamespace(errors={})
+
+        def near_vector(filters, **kwargs):
+            assert filters is None, "tenants need no namespace filter"
+            self.searched.append(tenant)
+            found = [
+                types.SimpleNamespace(uuid=i, properties=obj.properties, metadata=types.SimpleNamespace(distance=0.0))
+                for i, obj in enumerate(self.objects[tenant])
+            ]
+            return types.SimpleNamespace(objects=found[: kwargs["limit"]])
+
+        def over_all(total_count):
+            return types.SimpleNamespace(total_count=len(self.objects[tenant]))
+
+        return types.SimpleNamespace(
+            data=types.SimpleNamespace(insert_many=insert_many),
+            query=types.SimpleNamespace(near_vector=near_vector),
+            aggregate=types.SimpleNamespace(over_all=over_all),
+        )
+
+
+def test_tenant_vector_store():
+    print("🧪 Testing per-meeting tenants...")
+    collection = FakeTenantCollection()
+    connection = types.SimpleNamespace(url="http://weaviate:8080", get_collection=lambda name: collection, invalidate=lambda: None)
+    store = TenantVectorStore("meeting_chunks", connection)
+    first = "https:__storage.example.com_o_" + "a" * 100 + ".mp3?alt=media&token=1"
+    second = "https:__storage.example.com_o_" + "a" * 100 + ".mp3?alt=media&token=2"
+    assert tenant_name(first) != tenant_name(second)
+
+    store.insert_many(first, [{"properties": {"text": "first meeting"}, "vector": [1.0, 0.0]}])
+    store.insert_many(second, [{"properties": {"text": "second meeting"}, "vector": [1.0, 0.0]}] * 2)
+    hits = store.query(first, [1.0, 0.0], 10)
+    assert [hit.properties["text"] for hit in hits] == ["first meeting"]
+    assert collection.searched == [tenant_name(first)]
+    print("✅ Searches read only the meeting's own tenant")
+
+    assert store.query("never-indexed", [1.0, 0.0], 10) == []
+    assert store.delete(second) == 2 and tenant_name(second) not in collection.objects
+    print("✅ Missing tenants return nothing; deleting a meeting drops its tenant")
+
+
+def test_delete_beyond_query_limit():
+    print("🧪 Testing deletes larger than one batch...")
+    objects = list(range(25))
+    calls = []
+
+    def delete_many(where):
+        calls.append(where)
+        deleted = objects[:10]
+        del objects[:10]
+        return types.SimpleNamespace(successful=len(deleted), matches=len(deleted))
+
+    collection = types.SimpleNamespace(data=types.SimpleNamespace(delete_many=delete_many))
+    connection = types.SimpleNamespace(url="http://weaviate:8080", get_collection=lambda name: collection, invalidate=lambda: None)
+    store = WeaviateVectorStore("chatpdf", connection)
+    assert store.delete("repo") == 25 and not objects
+    assert len(calls) == 4
+    print("✅ Deleted 25 objects 10 at a time")
+
+
+def test_fallback_returns_to_weaviate():
+    print("🧪 Testing the local fallback...")
+    connection = FakeConnection()
+    connection.reachable = False
+    vector_store.VECTOR_BACKEND = "auto"
+    vector_store.weaviate_connection = connection
+
+    local = get_vector_store("chatpdf")
+    assert not isinstance(local, WeaviateVectorStore)
+    assert get_vector_store("chatpdf") is local
+    print("✅ Local store used while Weaviate is down")
+
+    connection.reachable = True
+    store = get_vector_store("chatpdf")
+    assert isinstance(store, WeaviateVectorStore) and get_vector_store("chatpdf") is store
+    print("✅ Switched back once Weaviate was reachable")
+
+    connection.clients[-1].ready = False
+    connection.reachable = False
+    try:
+        store.delete("repo")
+    except VectorStoreUnavailableError as e:
+        print(f"✅ Requests to a Weaviate that went away raise VectorStoreUnavailableError: {e}")
+    else:
+        raise AssertionError("expected VectorStoreUnavailableError")
+    assert get_vector_store("chatpdf").store_id == local.store_id
+    connection.reachable = True
+    assert get_vector_store("chatpdf") is store
+    print("✅ Later outages fall back to the local store too")
+
+    from index_state import get_indexed_commit, set_indexed_commit
+
+    set_indexed_commit("repo", local.store_id, "abc123")
+    assert get_indexed_commit("repo", local.store_id) == "abc123"
+    assert get_indexed_commit("repo", store.store_id) is None
+    print("✅ A repository indexed during the outage is indexed again into Weaviate")
+
+
+if __name__ == "__main__":
+    test_weaviate_connection()
+    test_incompatible_schema_recreated()
+    test_tenant_vector_store()
+    test_delete_beyond_query_limit()
+    test_fallback_returns_to_weaviate()
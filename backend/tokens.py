@@ -0,0 +1,80 @@
+"""
+Token counting helpers shared by the OpenAI request paths
+"""
+
+# Rough characters-per-token ratio for English text and code, used when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+_encodings = {}
+
+
+def _get_encoding(model):
+    """Return the tiktoken encoding for a model, or None when tiktoken is not installed"""
+    if model in _encodings:
+        return _encodings[model]
+    try:
+        import tiktoken
+    except ImportError:
+        encoding = None
+    else:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    _encodings[model] = encoding
+    return encoding
+
+
+def count_tokens(text, model="text-embedding-ada-002"):
+    """Count the tokens in text, estimating from its length if tiktoken is unavailable"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens, model="text-embedding-ada-002"):
+    """Cut text down to at most max_tokens tokens"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return text[: max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def _split_long_line(line, max_tokens, model):
+    """Hard-split a single line that does not fit in max_tokens"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        step = max_tokens * CHARS_PER_TOKEN
+        return [line[i:i + step] for i in range(0, len(line), step)]
+    tokens = encoding.encode(line, disallowed_special=())
+    return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+def chunk_by_tokens(text, max_tokens, model="text-embedding-ada-002"):
+    """Split text into chunks of at most max_tokens tokens, breaking between lines where possible"""
+    if count_tokens(text, model) <= max_tokens:
+        return [text]
+    chunks = []
+    current = []
+    current_tokens = 0
+    for line in text.splitlines(keepends=True):
+        line_tokens = count_tokens(line, model)
+        if line_tokens > max_tokens:
+            pieces = _split_long_line(line, max_tokens, model)
+        else:
+            pieces = [line]
+        for piece in pieces:
+            piece_tokens = line_tokens if len(pieces) == 1 else count_tokens(piece, model)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("".join(current))
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
@@ -0,0 +1,177 @@
+"""
+Asynchronous meeting transcription: submit audio, then wait for the transcript
+without blocking the event loop, by polling and, when configured, a webhook.
+"""
+import os
+import time
+import uuid
+import asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# assemblyai, or fake for a local service that needs no network
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "assemblyai")
+ASSEMBLYAI_API_URL = os.getenv("ASSEMBLYAI_API_URL", "https://api.assemblyai.com/v2")
+# Public URL of POST /transcription-webhook; when unset completion is found by polling alone
+TRANSCRIPTION_WEBHOOK_URL = os.getenv("TRANSCRIPTION_WEBHOOK_URL")
+TRANSCRIPTION_WEBHOOK_SECRET = os.getenv("TRANSCRIPTION_WEBHOOK_SECRET")
+TRANSCRIPTION_WEBHOOK_HEADER = "X-Transcription-Webhook-Secret"
+# Polling starts at the first interval and backs off to the maximum
+TRANSCRIPTION_POLL_INTERVAL_SECONDS = float(os.getenv("TRANSCRIPTION_POLL_INTERVAL_SECONDS", "3"))
+TRANSCRIPTION_POLL_MAX_INTERVAL_SECONDS = float(os.getenv("TRANSCRIPTION_POLL_MAX_INTERVAL_SECONDS", "30"))
+TRANSCRIPTION_TIMEOUT_SECONDS = float(os.getenv("TRANSCRIPTION_TIMEOUT_SECONDS", str(3 * 60 * 60)))
+# How long the fake service pretends to transcribe
+FAKE_TRANSCRIPTION_DELAY_SECONDS = float(os.getenv("FAKE_TRANSCRIPTION_DELAY_SECONDS", "1"))
+
+_service = None
+# Transcripts being waited on, set when their webhook arrives
+_ready_events = {}
+
+
+class TranscriptionError(Exception):
+    """Raised when a transcript cannot be submitted or fails to complete"""
+
+
+class AssemblyAITranscriptionService:
+    """Talks to the AssemblyAI REST API with a non-blocking HTTP client"""
+
+    def __init__(self, api_key, api_url=ASSEMBLYAI_API_URL):
+        self.api_key = api_key
+        self.api_url = api_url.rstrip("/")
+        self._client = None
+
+    def _http_client(self):
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(headers={"authorization": self.api_key or ""}, timeout=httpx.Timeout(30.0, connect=10.0))
+        return self._client
+
+    async def _request(self, method, path, **kwargs):
+        import httpx
+
+        try:
+            response = await self._http_client().request(method, f"{self.api_url}{path}", **kwargs)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise TranscriptionError(f"AssemblyAI request failed: {e}") from e
+        return response.json()
+
+    async def submit(self, audio_url, webhook_url=None):
+        """Queue audio for transcription and return the transcript id"""
+        body = {"audio_url": audio_url, "auto_chapters": True}
+        if webhook_url:
+            body["webhook_url"] = webhook_url
+            if TRANSCRIPTION_WEBHOOK_SECRET:
+                body["webhook_auth_header_name"] = TRANSCRIPTION_WEBHOOK_HEADER
+                body["webhook_auth_header_value"] = TRANSCRIPTION_WEBHOOK_SECRET
+        return (await self._request("POST", "/transcript", json=body))["id"]
+
+    async def get(self, transcript_id):
+        """Current state of a transcript: status is queued, processing, completed or error"""
+        return await self._request("GET", f"/transcript/{transcript_id}")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class FakeTranscriptionService:
+    """Completes every transcript after a delay with a canned meeting, for offline use and tests"""
+
+    def __init__(self, delay_seconds=FAKE_TRANSCRIPTION_DELAY_SECONDS, text=None, chapters=None):
+        self.delay_seconds = delay_seconds
+        self.text = text or (
+            "Welcome everyone, today we are planning the next release. "
+            "The login page is slow and we agreed to cache the session lookup. "
+            "Next we discussed the database migration, which should happen on Friday. "
+            "Alice will write the migration script and Bob will review it."
+        )
+        self.chapters = chapters or [
+            {"start": 0, "end": 65_000, "gist": "Release planning", "headline": "The login page is slow and session lookups will be cached.", "summary": "The team planned the next release and agreed to cache the session lookup to speed up the login page."},
+            {"start": 65_000, "end": 150_000, "gist": "Database migration", "headline": "The database migration happens on Friday.", "summary": "Alice will write the migration script for Friday and Bob will review it."},
+        ]
+        self._transcripts = {}
+
+    async def submit(self, audio_url, webhook_url=None):
+        transcript_id = uuid.uuid4().hex
+        self._transcripts[transcript_id] = {"audio_url": audio_url, "ready_at": time.monotonic() + self.delay_seconds}
+        return transcript_id
+
+    async def get(self, transcript_id):
+        transcript = self._transcripts.get(transcript_id)
+        if transcript is None:
+            raise TranscriptionError(f"Unknown transcript {transcript_id}")
+        if time.monotonic() < transcript["ready_at"]:
+            return {"id": transcript_id, "status": "processing"}
+        # Words are spread evenly over the chapters' time span, like the timings AssemblyAI returns
+        words = self.text.split()
+        duration = self.chapters[-1]["end"] if self.chapters else 1000 * len(words)
+        timed = [
+            {"text": word, "start": i * duration // len(words), "end": (i + 1) * duration // len(words)}
+            for i, word in enumerate(words)
+        ]
+        return {"id": transcript_id, "status": "completed", "text": self.text, "chapters": self.chapters, "words": timed}
+
+    async def close(self):
+        pass
+
+
+def get_transcription_service():
+    """Return the configured transcription service, creating it on first use"""
+    global _service
+    if _service is None:
+        if TRANSCRIPTION_BACKEND == "fake":
+            _service = FakeTranscriptionService()
+        else:
+            _service = AssemblyAITranscriptionService(os.getenv("AAI_TOKEN"))
+    return _service
+
+
+async def close_transcription_service():
+    """Close the transcription service's connections, if it was ever created"""
+    global _service
+    if _service is not None:
+        await _service.close()
+        _service = None
+
+
+def notify_transcript(transcript_id):
+    """Wake the job waiting on a transcript; returns False if nothing is waiting on it"""
+    event = _ready_events.get(transcript_id)
+    if event is None:
+        return False
+    event.set()
+    return True
+
+
+async def wait_for_transcript(transcript_id, service=None, timeout=TRANSCRIPTION_TIMEOUT_SECONDS):
+    """Poll until a transcript completes, checking early whenever its webhook arrives.
+
+    Raises TranscriptionError if it fails or does not complete within timeout seconds.
+    """
+    service = service or get_transcription_service()
+    event = _ready_events.setdefault(transcript_id, asyncio.Event())
+    deadline = time.monotonic() + timeout
+    interval = TRANSCRIPTION_POLL_INTERVAL_SECONDS
+    try:
+        while True:
+            event.clear()
+            transcript = await service.get(transcript_id)
+            if transcript["status"] == "completed":
+                return transcript
+            if transcript["status"] == "error":
+                raise TranscriptionError(f"Transcript {transcript_id} failed: {transcript.get('error')}")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TranscriptionError(f"Transcript {transcript_id} did not complete within {timeout:g}s")
+            try:
+                await asyncio.wait_for(event.wait(), min(interval, remaining))
+            except asyncio.TimeoutError:
+                pass
+            interval = min(interval * 1.5, TRANSCRIPTION_POLL_MAX_INTERVAL_SECONDS)
+    finally:
+        _ready_events.pop(transcript_id, None)
@@ -0,0 +1,277 @@
+"""
+Vector storage backends shared by the documentation, Q&A and meeting endpoints.
+
+Objects are inserted as {"properties": {...}, "vector": [...]} and always belong
+to a namespace (a repository or a meeting). Searches use cosine distance.
+"""
+import os
+import re
+import json
+import hashlib
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from weaviate_client import weaviate_connection, store_id, MULTI_TENANT_COLLECTIONS
+
+load_dotenv()
+
+# "weaviate" or "local"; anything else uses Weaviate when it is reachable and the local store otherwise
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "auto")
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".vector_store")
+
+
+class VectorStoreUnavailableError(ConnectionError):
+    """Raised when the vector store cannot be reached"""
+
+
+@dataclass
+class Hit:
+    uuid: str
+    properties: dict
+    distance: float
+
+
+def _matches(properties, where):
+    """Check properties against an equality filter; list values match any of their items"""
+    for key, expected in (where or {}).items():
+        value = properties.get(key)
+        if isinstance(expected, (list, tuple, set)):
+            if value not in expected:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+def _select(properties, return_properties):
+    if return_properties is None:
+        return dict(properties)
+    return {key: properties.get(key) for key in return_properties}
+
+
+class WeaviateVectorStore:
+    """Vector store backed by a Weaviate collection holding a "namespace" property.
+
+    The collection is looked up through the shared connection on every call, so
+    the store keeps working after Weaviate restarts.
+    """
+
+    def __init__(self, name, connection=weaviate_connection):
+        self.name = name
+        self.connection = connection
+        # Identifies where the vectors live, so index state is tracked per store
+        self.store_id = store_id(connection.url, name)
+
+    @property
+    def collection(self):
+        collection = self.connection.get_collection(self.name)
+        if collection is None:
+            raise VectorStoreUnavailableError("Weaviate is unavailable")
+        return collection
+
+    def _call(self, operation):
+        try:
+            return operation(self.collection)
+        except VectorStoreUnavailableError:
+            raise
+        except Exception as e:
+            # Re-check the connection before the next request in case Weaviate went away
+            self.connection.invalidate()
+            if self.connection.get_collection(self.name) is None:
+                raise VectorStoreUnavailableError(f"Weaviate became unavailable: {e}") from e
+            raise
+
+    def _scoped(self, collection, namespace):
+        """The part of the collection holding namespace"""
+        return collection
+
+    def _filters(self, namespace, where=None):
+        from weaviate.classes.query import Filter
+
+        filters = [Filter.by_property("namespace").equal(namespace)]
+        for key, expected in (where or {}).items():
+            if isinstance(expected, (list, tuple, set)):
+                filters.append(Filter.by_property(key).contains_any(list(expected)))
+            else:
+                filters.append(Filter.by_property(key).equal(expected))
+        return Filter.all_of(filters) if len(filters) > 1 else filters[0]
+
+    def _graphql_scope(self, namespace):
+        """GraphQL arguments restricting a Get clause to namespace"""
+        return f'where: {{path: ["namespace"], operator: Equal, valueText: {json.dumps(namespace)}}}'
+
+    def _has_namespace(self, collection, namespace):
+        return True
+
+    def insert_many(self, namespace, objects):
+        """Insert objects in one request; returns a list of (position, error message) for failed objects"""
+        from weaviate.classes.data import DataObject
+
+        data = [
+            DataObject(properties={**obj["properties"], "namespace": namespace}, vector=obj["vector"])
+            for obj in objects
+        ]
+        result = self._call(lambda collection: self._scoped(collection, namespace).data.insert_many(data))
+        return [(i, error.message) for i, error in result.errors.items()]
+
+    def query(self, namespace, vector, limit, max_distance=None, return_properties=None, where=None):
+        """Return up to limit hits closest to vector, nearest first"""
+        from weaviate.classes.query import MetadataQuery
+
+        def search(collection):
+            if not self._has_namespace(collection, namespace):
+                return []
+            return self._scoped(collection, namespace).query.near_vector(
+                near_vector=vector,
+                limit=limit,
+                distance=max_distance,
+                filters=self._filters(namespace, where),
+                return_properties=return_properties,
+                return_metadata=MetadataQuery(distance=True),
+            ).objects
+
+        return [Hit(str(obj.uuid), obj.properties, obj.metadata.distance) for obj in self._call(search)]
+
+    def query_many(self, namespace, vectors, limit, max_distance=None, return_properties=None):
+        """Run query for several vectors at once; returns one list of hits per vector.
+
+        All searches go out as aliased clauses of one GraphQL request returning only
+        ids and distances, and the properties of the distinct objects found are then
+        fetched in a single request, so files shared between searches are sent once.
+        """
+        from weaviate.classes.query import Filter
+
+        if not vectors:
+            return []
+
+        def search(collection):
+            if not self._has_namespace(collection, namespace):
+                return {}
+            clauses = []
+            for i, vector in enumerate(vectors):
+                arguments = f"vector: {json.dumps([float(x) for x in vector])}"
+                if max_distance is not None:
+                    arguments += f", distance: {float(max_distance)}"
+                clauses.append(
+                    f"q{i}: {collection.name}(nearVector: {{{arguments}}}, limit: {int(limit)}, {self._graphql_scope(namespace)}) "
+                    "{ _additional { id distance } }"
+                )
+            response = self.connection.client.graphql_raw_query("{ Get { " + " ".join(clauses) + " } }")
+            if response.errors:
+                raise RuntimeError(f"Weaviate query failed: {response.errors}")
+            return response.get
+
+        found = self._call(search)
+        matches = [
+            [(obj["_additional"]["id"], obj["_additional"]["distance"]) for obj in found.get(f"q{i}") or []]
+            for i in range(len(vectors))
+        ]
+        ids = list({object_id for hits in matches for object_id, _ in hits})
+        properties = {}
+        if ids:
+            response = self._call(lambda collection: self._scoped(collection, namespace).query.fetch_objects(
+                filters=Filter.by_id().contains_any(ids),
+                limit=len(ids),
+                return_properties=return_properties,
+            ))
+            properties = {str(obj.uuid): obj.properties for obj in response.objects}
+        return [
+            [Hit(object_id, properties[object_id], distance) for object_id, distance in hits if object_id in properties]
+            for hits in matches
+        ]
+
+    def delete(self, namespace, where=None):
+        """Delete the objects of a namespace matching where; returns how many were deleted"""
+        filters = self._filters(namespace, where)
+        return self._call(lambda collection: _delete_all(collection.data, filters))
+
+
+def _delete_all(data, filters):
+    """delete_many removes at most QUERY_MAXIMUM_RESULTS objects (10,000 by default) per call, so repeat until none are left"""
+    deleted = 0
+    while True:
+        successful = data.delete_many(where=filters).successful
+        if not successful:
+            return deleted
+        deleted += successful
+
+
+def tenant_name(namespace):
+    """Weaviate tenant for a namespace, within the 64 letters, digits, underscores and hyphens a tenant name allows"""
+    digest = hashlib.sha1(namespace.encode("utf-8")).hexdigest()[:16]
+    return re.sub(r"[^A-Za-z0-9_-]", "_", namespace)[-47:] + "-" + digest
+
+
+class TenantVectorStore(WeaviateVectorStore):
+    """Weaviate store for a multi-tenant collection, keeping each namespace in its own tenant.
+
+    A search only reads the index of its namespace's tenant, however large the
+    rest of the collection grows, and a whole namespace is deleted by dropping its tenant.
+    """
+
+    def _scoped(self, collection, namespace):
+        return collection.with_tenant(tenant_name(namespace))
+
+    def _filters(self, namespace, where=None):
+        if not where:
+            return None
+        return super()._filters(namespace, where)
+
+    def _graphql_scope(self, namespace):
+        return f"tenant: {json.dumps(tenant_name(namespace))}"
+
+    def _has_namespace(self, collection, namespace):
+        # Tenants are created by their first insert; searching a missing one is an error
+        return collection.tenants.exists(tenant_name(namespace))
+
+    def delete(self, namespace, where=None):
+        def delete(collection):
+            if not self._has_namespace(collection, namespace):
+                return 0
+            scoped = self._scoped(collection, namespace)
+            if where:
+                return _delete_all(scoped.data, self._filters(namespace, where))
+            count = scoped.aggregate.over_all(total_count=True).total_count
+            collection.tenants.remove(tenant_name(namespace))
+            return count
+
+        return self._call(delete)
+
+
+_stores = {}
+# Local stores standing in for Weaviate while it is unreachable in "auto" mode
+_fallback_stores = {}
+
+
+def get_vector_store(name):
+    """Return the store for a collection name, connecting to Weaviate on first use.
+
+    With VECTOR_BACKEND "auto" the local store is used while Weaviate is
+    unreachable, also when it goes away after having been used; Weaviate is tried
+    again at most every WEAVIATE_HEALTH_CHECK_INTERVAL seconds and used as soon as
+    it is back. With "weaviate" None is returned while Weaviate is unreachable,
+    and a later call retries.
+    """
+    if VECTOR_BACKEND == "local":
+        if name not in _stores:
+            _stores[name] = _local_store(name)
+        return _stores[name]
+    if weaviate_connection.get_collection(name) is not None:
+        if _fallback_stores.pop(name, None) is not None:
+            print(f"✅ Weaviate is reachable again, no longer using the local store for '{name}'")
+        if name not in _stores:
+            store_class = TenantVectorStore if name in MULTI_TENANT_COLLECTIONS else WeaviateVectorStore
+            _stores[name] = store_class(name, weaviate_connection)
+        return _stores[name]
+    if VECTOR_BACKEND == "weaviate":
+        return None
+    if name not in _fallback_stores:
+        _fallback_stores[name] = _local_store(name)
+    return _fallback_stores[name]
+
+
+def _local_store(name):
+    # numpy is only loaded by deployments that use the embedded store
+    from local_vector_store import LocalVectorStore
+
+    print(f"Using local vector store for '{name}' in {VECTOR_STORE_DIR}")
+    return LocalVectorStore(name)
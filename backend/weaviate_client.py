@@ -0,0 +1,186 @@
+"""
+One shared, lazily connected Weaviate client for the whole process.
+
+Nothing connects at import time. The first caller connects and creates any
+missing collections, recreating those whose schema would make exact-match
+filters unreliable. The connection is health-checked at most every
+WEAVIATE_HEALTH_CHECK_INTERVAL seconds and rebuilt when Weaviate restarts.
+"""
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WEAVIATE_URL = os.getenv("WEAVIATE_URL", "http://localhost:8080")
+WEAVIATE_GRPC_PORT = int(os.getenv("WEAVIATE_GRPC_PORT", "50051"))
+# Seconds between readiness checks of a live connection, and between reconnect attempts after a failure
+WEAVIATE_HEALTH_CHECK_INTERVAL = float(os.getenv("WEAVIATE_HEALTH_CHECK_INTERVAL", "10"))
+
+# Text properties of each collection; "field" tokenization makes equality filters match whole values
+COLLECTION_PROPERTIES = {
+    "chatpdf": [
+        ("source", "field"),
+        ("code", "word"),
+        ("summary", "word"),
+        ("namespace", "field"),
+    ],
+    "meeting_chunks": [
+        ("text", "word"),
+        ("level", "field"),
+        ("chapter", "field"),
+        ("start", "field"),
+        ("end", "field"),
+        ("namespace", "field"),
+    ],
+}
+# Integer properties of each collection
+INT_PROPERTIES = {
+    "meeting_chunks": ["start_ms"],
+}
+# Collections holding one tenant (a separate shard and index) per namespace, so searches never touch other namespaces
+MULTI_TENANT_COLLECTIONS = {"meeting_chunks"}
+
+
+def store_id(url, name):
+    """Identity of a collection of a Weaviate server, used to track what was indexed into it"""
+    return f"weaviate:{url}/{name}"
+
+
+def schema_problems(name, config):
+    """Ways an existing collection's schema differs from the one this backend creates"""
+    problems = []
+    existing = {prop.name: prop for prop in config.properties}
+    for prop, tokenization in COLLECTION_PROPERTIES.get(name, []):
+        if tokenization != "field":
+            continue
+        # A missing property would be auto-created with "word" tokenization on first insert
+        actual = existing[prop].tokenization if prop in existing else None
+        actual = getattr(actual, "value", actual)
+        if actual != "field":
+            problems.append(f"'{prop}' is tokenized as {actual or 'word (auto-schema)'} instead of field")
+    if name in MULTI_TENANT_COLLECTIONS and not config.multi_tenancy_config.enabled:
+        problems.append("multi-tenancy is disabled")
+    return problems
+
+
+class WeaviateConnection:
+    def __init__(self, url=WEAVIATE_URL, grpc_port=WEAVIATE_GRPC_PORT, health_check_interval=WEAVIATE_HEALTH_CHECK_INTERVAL):
+        self.url = url
+        self.grpc_port = grpc_port
+        self.health_check_interval = health_check_interval
+        self.client = None
+        self.reconnects = 0
+        self._collections = {}
+        self._checked_at = 0.0
+        self._failed_at = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        import weaviate
+        from weaviate.classes.init import AdditionalConfig, Timeout
+
+        client = weaviate.WeaviateClient(
+            connection_params=weaviate.connect.ConnectionParams.from_url(url=self.url, grpc_port=self.grpc_port),
+            additional_config=AdditionalConfig(timeout=Timeout(init=5, query=30, insert=120)),
+        )
+        client.connect()
+        return client
+
+    def _ensure_collection(self, name):
+        from weaviate.classes.config import Configure, DataType, Property, Tokenization
+
+        if self.client.collections.exists(name):
+            collection = self.client.collections.get(name)
+            problems = schema_problems(name, collection.config.get())
+            if not problems:
+                return collection
+            # Word-tokenized filters would make a delete of src/main.py remove everything mentioning src, main or py
+            print(f"⚠️ Collection '{name}' has an incompatible schema ({'; '.join(problems)}), recreating it...")
+            self.client.collections.delete(name)
+            # Everything indexed into it is gone, so the next run indexes those repositories in full
+            from index_state import forget_store
+
+            forget_store(store_id(self.url, name))
+        else:
+            print(f"⚠️ Collection '{name}' not found, creating it...")
+        self.client.collections.create(
+            name=name,
+            properties=[
+                Property(name=prop, data_type=DataType.TEXT, tokenization=Tokenization(tokenization))
+                for prop, tokenization in COLLECTION_PROPERTIES.get(name, [])
+            ]
+            + [Property(name=prop, data_type=DataType.INT) for prop in INT_PROPERTIES.get(name, [])],
+            vectorizer_config=Configure.Vectorizer.none(),
+            multi_tenancy_config=Configure.multi_tenancy(enabled=True, auto_tenant_creation=True)
+            if name in MULTI_TENANT_COLLECTIONS
+            else None,
+        )
+        return self.client.collections.get(name)
+
+    def _close_client(self):
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+        self.client = None
+        self._collections = {}
+
+    def _healthy(self):
+        if self.client is None:
+            return False
+        if time.monotonic() - self._checked_at < self.health_check_interval:
+            return True
+        try:
+            ready = self.client.is_ready()
+        except Exception:
+            ready = False
+        self._checked_at = time.monotonic()
+        return ready
+
+    def get_collection(self, name):
+        """Return the named collection, connecting or reconnecting as needed; None if Weaviate is unreachable"""
+        with self._lock:
+            if not self._healthy():
+                if self._failed_at is not None and time.monotonic() - self._failed_at < self.health_check_interval:
+                    return None
+                if self.client is not None:
+                    print("⚠️ Weaviate connection lost, reconnecting...")
+                    self.reconnects += 1
+                self._close_client()
+                try:
+                    self.client = self._connect()
+                except Exception as e:
+                    print(f"⚠️ Warning: Could not connect to Weaviate: {e}")
+                    print("💡 Make sure Weaviate is running with: docker-compose -f weaviate-docker-compose.yml up")
+                    self._close_client()
+                    self._failed_at = time.monotonic()
+                    return None
+                self._failed_at = None
+                self._checked_at = time.monotonic()
+                print("✅ Connected to Weaviate successfully")
+            if name not in self._collections:
+                try:
+                    self._collections[name] = self._ensure_collection(name)
+                except Exception as e:
+                    print(f"⚠️ Warning: Could not open Weaviate collection '{name}': {e}")
+                    return None
+            return self._collections[name]
+
+    def invalidate(self):
+        """Force a health check before the next use, e.g. after a request failed"""
+        with self._lock:
+            self._checked_at = 0.0
+
+    def close(self):
+        """Close the client; the next use reconnects"""
+        with self._lock:
+            self._close_client()
+
+    def stats(self):
+        return {"url": self.url, "connected": self.client is not None, "reconnects": self.reconnects}
+
+
+weaviate_connection = WeaviateConnection()
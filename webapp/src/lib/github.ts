@@ -52,22 +52,29 @@ export const pollRepo = async (githubUrl: string, projectId: string) => {
     (hash) =>
       !processedCommits.some((commit) => commit.commitHash === hash.commitHash),
   );
-  const summariesResponse = await Promise.allSettled(
-    unprocessedCommits.map((hash) => {
-      return axios.post(
-        `${process.env.PYTHON_AI_BACKEND_URL}/summarise-commit`,
+  // One request for every new commit; the backend summarises them concurrently
+  const summariesByHash = new Map<string, string>();
+  if (unprocessedCommits.length > 0) {
+    try {
+      const { data } = await axios.post(
+        `${process.env.PYTHON_AI_BACKEND_URL}/summarise-commits`,
         {
           github_url: githubUrl,
-          commitHash: hash.commitHash,
+          commitHashes: unprocessedCommits.map((hash) => hash.commitHash),
         },
       );
-    }),
-  );
-  const summaries = summariesResponse.map((summary) => {
-    if (summary.status === "fulfilled") {
-      return summary.value.data.summary as string;
+      for (const result of data.summaries as { commitHash: string; summary?: string }[]) {
+        if (result.summary) {
+          summariesByHash.set(result.commitHash, result.summary);
+        }
+      }
+    } catch (error) {
+      console.error("Failed to summarise commits", error);
     }
-  });
+  }
+  const summaries = unprocessedCommits.map((hash) =>
+    summariesByHash.get(hash.commitHash),
+  );
   const commits = await Promise.all(
     summaries.map((summary, idx) => 
       db.commit.create({
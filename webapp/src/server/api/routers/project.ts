@@ -6,6 +6,25 @@ import { createTRPCRouter, protectedProcedure } from "@/server/api/trpc";
 import { TRPCError } from "@trpc/server";
 import { pollRepo } from "@/lib/github";
 
+// Transcription runs as a background job on the backend; poll it until it finishes
+const waitForBackendJob = async (jobId: string) => {
+  const backendUrl = process.env.PYTHON_AI_BACKEND_URL;
+  for (;;) {
+    const { data: job } = await axios.get(`${backendUrl}/jobs/${jobId}`);
+    if (job.status === "succeeded") {
+      const { data } = await axios.get(`${backendUrl}/jobs/${jobId}/result`);
+      return data;
+    }
+    if (job.status === "failed" || job.status === "cancelled") {
+      throw new TRPCError({
+        code: "INTERNAL_SERVER_ERROR",
+        message: job.error ?? `Job ${job.status}`,
+      });
+    }
+    await new Promise((resolve) => setTimeout(resolve, 3000));
+  }
+};
+
 export const projectRouter = createTRPCRouter({
   createProject: protectedProcedure
     .input(
@@ -257,12 +276,13 @@ export const projectRouter = createTRPCRouter({
           message: "Project not found",
         });
       }
-      const { data } = await axios.post(
+      const { data: job } = await axios.post(
         `${process.env.PYTHON_AI_BACKEND_URL}/transcribe-meeting`,
         {
           url: input.audio_url,
         },
       );
+      const data = await waitForBackendJob(job.job_id);
       const summaries = data.summaries as any[];
       if (!summaries.length) {
         throw new TRPCError({